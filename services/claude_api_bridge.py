@@ -2,137 +2,309 @@
 """
 Claude API Bridge Service
 Uses the analysis tool to properly call the real Claude API for voice commands
+
+Production entrypoint (concurrent voice commands):
+    gunicorn --chdir services claude_api_bridge:app -k gevent -w 2 --worker-connections 100 -b 0.0.0.0:8091
 """
 
-import json
 import logging
+import re
 import subprocess
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
+import orjson
 import requests
-from flask import Flask, request, jsonify
+from cachetools import TTLCache
+from flask import Flask, request
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+# CoreGraphics capture avoids spawning screencapture when PyObjC is installed
+try:
+    from Foundation import NSURL
+    from Quartz import (
+        CGMainDisplayID, CGDisplayCreateImage, CGImageDestinationCreateWithURL,
+        CGImageDestinationAddImage, CGImageDestinationFinalize
+    )
+    QUARTZ_AVAILABLE = True
+except ImportError:
+    QUARTZ_AVAILABLE = False
+
+class ClaudeAction(BaseModel):
+    """A single action requested by Claude; action-specific fields are kept as extras"""
+    model_config = ConfigDict(extra='allow')
+    
+    action: str
+    target: Optional[str] = None
+    save_path: Optional[str] = None
+    text: Optional[str] = None
+
+class ClaudeActionPlan(BaseModel):
+    """Claude's JSON reply: the actions to run plus a spoken response"""
+    actions: List[ClaudeAction] = []
+    response: str = ""
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, used by jsonify, error handlers and get_json"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+# Let Werkzeug refuse huge bodies before they reach Python
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024
 CORS(app)
 
-@app.route('/health', methods=['GET'])
-def health():
-    return jsonify({
-        "status": "healthy",
-        "service": "claude_api_bridge",
-        "port": 8091,
-        "capabilities": ["real_claude_api", "voice_processing", "action_execution"]
-    })
+# Limit for /process_command input
+MAX_COMMAND_LENGTH = 2000
 
-@app.route('/process_command', methods=['POST'])
-def process_command():
-    """Process voice commands using real Claude API through the analysis tool"""
-    try:
-        data = request.get_json()
-        command = data.get('command', '')
-        
-        if not command:
-            return jsonify({"error": "No command provided"}), 400
-        
-        logger.info(f"Sending voice command to real Claude via analysis tool: '{command}'")
-        
-        # Create a request to the analysis tool that will call Claude
-        analysis_request = {
-            "voice_command": command,
-            "request_type": "voice_processing",
-            "user_location": "macOS system",
-            "available_actions": [
-                "search - Search filesystem", 
-                "open - Open files/folders/apps",
-                "screenshot - Capture screen",
-                "memory - Store/retrieve information",
-                "organize - Organize files",
-                "respond - Provide response"
-            ]
+ANALYSIS_URL = "http://localhost:3000/analysis"
+ANALYSIS_REGISTER_URL = "http://localhost:3000/register"
+
+# Shared session so voice commands reuse the analysis tool connection
+SESSION = requests.Session()
+SESSION.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# Actions are independent subprocess calls, so run them concurrently
+_ACTION_POOL = ThreadPoolExecutor(max_workers=4)
+
+# Absolute tool paths skip the PATH lookup so subprocess can use posix_spawn.
+# That fast path also requires close_fds=False; Python's own descriptors are
+# non-inheritable (PEP 446), so nothing leaks into the child.
+OSASCRIPT = "/usr/bin/osascript"
+SCREENCAPTURE = "/usr/sbin/screencapture"
+
+# Drives that can be opened directly from /Volumes
+_KNOWN_VOLUMES = frozenset({"2TB", "2TBHDD", "4TB SSD", "NAS RAID"})
+_VOLUME_CHECK_TTL = 5  # seconds
+
+# Recent Claude plans keyed by normalized command text
+_CMD_CACHE = TTLCache(maxsize=256, ttl=60)
+_CMD_CACHE_LOCK = threading.Lock()
+
+# First output line that looks like a JSON actions object
+_JSON_LINE_RE = re.compile(r'^[ \t]*(\{.*actions.*?)[ \t\r]*$', re.M)
+
+# Prefix of analysis tool output lines carrying a single streamed action
+_STREAM_ACTION_PREFIX = "ACTION "
+
+# Handle for the Node code registered with the analysis tool, if it supports registration
+_analysis_handle = None
+_analysis_registration_tried = False
+
+# Node.js program run by the analysis tool; __REQ__ is replaced with the request JSON
+# (or with the registered snippet's "args" parameter)
+_NODE_TEMPLATE = """
+// The voice command request
+const requestData = __REQ__;
+
+// Emit each object of the "actions" array as soon as it has fully streamed in
+const createActionScanner = (emit) => {
+    let pos = -1, depth = 0, start = -1, inString = false, escaped = false;
+    return (text) => {
+        if (pos < 0) {
+            const key = text.indexOf('"actions"');
+            const bracket = key < 0 ? -1 : text.indexOf("[", key);
+            if (bracket < 0) return;
+            pos = bracket + 1;
         }
-        
-        # Write the request to a temp file that the analysis tool can read
-        temp_file = "/tmp/voice_command_request.json"
-        with open(temp_file, 'w') as f:
-            json.dump(analysis_request, f)
-        
-        # Call the analysis tool to process this command
-        result = subprocess.run([
-            "curl", "-X", "POST", "http://localhost:3000/analysis",
-            "-H", "Content-Type: application/json",
-            "-d", json.dumps({
-                "code": f"""
-// Read the voice command request
-const fs = require('fs');
-const requestData = JSON.parse(fs.readFileSync('/tmp/voice_command_request.json', 'utf8'));
+        for (; pos < text.length && depth >= 0; pos++) {
+            const ch = text[pos];
+            if (inString) {
+                if (escaped) escaped = false;
+                else if (ch === "\\\\") escaped = true;
+                else if (ch === '"') inString = false;
+            } else if (ch === '"') {
+                inString = true;
+            } else if (ch === "{") {
+                if (depth === 0) start = pos;
+                depth++;
+            } else if (ch === "}") {
+                depth--;
+                if (depth === 0) {
+                    try { emit(JSON.parse(text.slice(start, pos + 1))); } catch (e) {}
+                }
+            } else if (ch === "]" && depth === 0) {
+                depth = -1;  // end of the actions array
+            }
+        }
+    };
+};
 
 // Call the real Claude API
-const callRealClaude = async () => {{
-    try {{
-        const response = await fetch("https://api.anthropic.com/v1/messages", {{
+const callRealClaude = async () => {
+    try {
+        const response = await fetch("https://api.anthropic.com/v1/messages", {
             method: "POST",
-            headers: {{
+            headers: {
                 "Content-Type": "application/json",
-            }},
-            body: JSON.stringify({{
+            },
+            body: JSON.stringify({
                 model: "claude-sonnet-4-20250514",
                 max_tokens: 1500,
+                stream: true,
                 messages: [
-                    {{ 
+                    { 
                         role: "user", 
-                        content: `You are Claude, integrated with a macOS automation system. The user just spoke this voice command: "${{requestData.voice_command}}"
+                        content: `You are Claude, integrated with a macOS automation system. The user just spoke this voice command: "${requestData.voice_command}"
 
 Available Actions (respond with JSON):
-1. SEARCH - Search filesystem: {{"action": "search", "path": "/path/to/search", "pattern": "*.ext", "description": "what you're looking for"}}
-2. OPEN - Open files/folders: {{"action": "open", "target": "folder/file name", "type": "folder/file/app"}}
-3. SCREENSHOT - Capture screen: {{"action": "screenshot", "save_path": "/Users/mark/Desktop/screenshot.png"}}
-4. MEMORY - Store/search info: {{"action": "memory", "operation": "store/search", "content": "...", "category": "..."}}
-5. ORGANIZE - Organize files: {{"action": "organize", "path": "/path/to/organize"}}
-6. RESPOND - Give response: {{"action": "respond", "text": "your response to user"}}
+1. SEARCH - Search filesystem: {"action": "search", "path": "/path/to/search", "pattern": "*.ext", "description": "what you're looking for"}
+2. OPEN - Open files/folders: {"action": "open", "target": "folder/file name", "type": "folder/file/app"}
+3. SCREENSHOT - Capture screen: {"action": "screenshot", "save_path": "/Users/mark/Desktop/screenshot.png"}
+4. MEMORY - Store/search info: {"action": "memory", "operation": "store/search", "content": "...", "category": "..."}
+5. ORGANIZE - Organize files: {"action": "organize", "path": "/path/to/organize"}
+6. RESPOND - Give response: {"action": "respond", "text": "your response to user"}
 
 For complex commands, break into multiple actions. Respond ONLY with JSON in this format:
-{{"actions": [action1, action2, ...], "response": "your natural response to the user"}}`
-                    }}
+{"actions": [action1, action2, ...], "response": "your natural response to the user"}`
+                    }
                 ]
-            }})
-        }});
+            })
+        });
+        
+        // Read the SSE stream, printing each action line as it completes
+        const scanActions = createActionScanner(action => console.log("ACTION " + JSON.stringify(action)));
+        const decoder = new TextDecoder();
+        let pending = "";
+        let text = "";
+        for await (const chunk of response.body) {
+            pending += decoder.decode(chunk, { stream: true });
+            const frames = pending.split("\\n");
+            pending = frames.pop();
+            for (const frame of frames) {
+                if (!frame.startsWith("data: ")) continue;
+                const event = JSON.parse(frame.slice(6));
+                if (event.type === "content_block_delta" && event.delta.type === "text_delta") {
+                    text += event.delta.text;
+                    scanActions(text);
+                }
+            }
+        }
         
-        const data = await response.json();
-        console.log("Real Claude Response:", data.content[0].text);
-        return data.content[0].text;
+        console.log("Real Claude Response:", text);
+        try { console.log(JSON.stringify(JSON.parse(text))); } catch (e) {}
+        return text;
         
-    }} catch (error) {{
+    } catch (error) {
         console.log("Claude API Error:", error);
-        return JSON.stringify({{
-            "actions": [{{"action": "respond", "text": "I encountered an error processing your command: " + error.message}}],
+        return JSON.stringify({
+            "actions": [{"action": "respond", "text": "I encountered an error processing your command: " + error.message}],
             "response": "I had trouble processing your voice command."
-        }});
-    }}
-}};
+        });
+    }
+};
 
 await callRealClaude();
 """
-            })
-        ], capture_output=True, text=True, timeout=30)
+
+def ojsonify(obj, status=200):
+    """Build a JSON response serialized with orjson"""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+# Health payload never changes, so serialize it once
+_HEALTH_BODY = orjson.dumps({
+    "status": "healthy",
+    "service": "claude_api_bridge",
+    "port": 8091,
+    "capabilities": ["real_claude_api", "voice_processing", "action_execution"]
+})
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return ojsonify({"error": "command too large"}, 413)
+
+@app.route('/health', methods=['GET'])
+def health():
+    return app.response_class(_HEALTH_BODY, mimetype='application/json')
+
+@app.route('/process_command', methods=['POST'])
+def process_command():
+    """Process voice commands using real Claude API through the analysis tool"""
+    # Reject garbage bodies before any analysis tool work; bodies over MAX_CONTENT_LENGTH
+    # raise RequestEntityTooLarge here, outside the try, so they reach the 413 handler
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return ojsonify({"error": "Invalid JSON body"}, 400)
+    
+    try:
+        command = data.get('command', '')
+        
+        if not command:
+            return ojsonify({"error": "No command provided"}, 400)
+        if not isinstance(command, str):
+            return ojsonify({"error": "command must be a string"}, 400)
+        if len(command) > MAX_COMMAND_LENGTH:
+            return ojsonify({"error": "command too long"}, 413)
         
-        if result.returncode == 0:
-            # Extract Claude's response from the analysis tool output
-            claude_response = extract_claude_response(result.stdout)
+        # Repeated commands reuse Claude's plan; the actions themselves still run
+        cache_key = command.strip().lower()
+        use_cache = request.args.get('nocache') != '1'
+        claude_response = get_cached_claude_response(cache_key) if use_cache else None
+        streamed = []
+        
+        if claude_response is not None:
+            logger.info("Using cached Claude plan for voice command: '%s'", command)
         else:
-            logger.error(f"Analysis tool error: {result.stderr}")
-            claude_response = create_fallback_response(command)
+            logger.info("Sending voice command to real Claude via analysis tool: '%s'", command)
+            
+            # Create a request to the analysis tool that will call Claude
+            analysis_request = {
+                "voice_command": command,
+                "request_type": "voice_processing",
+                "user_location": "macOS system",
+                "available_actions": [
+                    "search - Search filesystem", 
+                    "open - Open files/folders/apps",
+                    "screenshot - Capture screen",
+                    "memory - Store/retrieve information",
+                    "organize - Organize files",
+                    "respond - Provide response"
+                ]
+            }
+            
+            # Call the analysis tool, starting each action as soon as Claude streams it
+            analysis_output = call_analysis_tool(
+                analysis_request,
+                on_action=lambda action: streamed.append(_ACTION_POOL.submit(_safe_execute_single, action))
+            )
+            
+            claude_json = find_claude_json(analysis_output) if analysis_output is not None else None
+            if claude_json is not None:
+                claude_response = claude_json
+                cache_claude_response(cache_key, claude_response)
+            elif analysis_output is not None:
+                # Extract Claude's response from the analysis tool output
+                claude_response = extract_claude_response(analysis_output)
+            else:
+                claude_response = create_fallback_response(command)
         
         # Parse Claude's response for actions
         actions = parse_claude_actions(claude_response)
         
-        # Execute the actions
-        execution_results = execute_actions(actions)
+        if not streamed and len(actions) == 1 and actions[0].get("action") == "respond":
+            # Pure text reply: log it inline rather than going through the action pool
+            execution_results = [execute_response_action(actions[0])]
+        else:
+            # Streamed actions are already running (they are a prefix of the full plan);
+            # execute whatever was not streamed
+            execution_results = [future.result() for future in streamed]
+            execution_results += execute_actions(actions[len(streamed):])
         
-        return jsonify({
+        return ojsonify({
             "status": "success",
             "result": {
                 "command": command,
@@ -144,108 +316,267 @@ await callRealClaude();
         })
         
     except Exception as e:
-        logger.error(f"Error processing command: {e}")
-        return jsonify({
+        logger.error("Error processing command: %s", e)
+        return ojsonify({
             "status": "error", 
             "message": str(e)
-        }), 500
+        }, 500)
+
+def register_analysis_code():
+    """Register the Node code once so later calls only send the request arguments"""
+    global _analysis_handle, _analysis_registration_tried
+    _analysis_registration_tried = True
+    try:
+        result = SESSION.post(
+            ANALYSIS_REGISTER_URL,
+            headers={"Content-Type": "application/json"},
+            data=orjson.dumps({"code": _NODE_TEMPLATE.replace("__REQ__", "args")}),
+            timeout=5
+        )
+        if result.ok:
+            _analysis_handle = orjson.loads(result.content).get("handle")
+            logger.info("Registered analysis code with handle %s", _analysis_handle)
+    except (requests.RequestException, orjson.JSONDecodeError, AttributeError) as e:
+        logger.warning("Analysis tool code registration unavailable: %s", e)
+
+def call_analysis_tool(analysis_request, on_action=None):
+    """Run the Claude call in the analysis tool and return its raw output, or None on failure.
+    
+    Actions streamed by the analysis tool are passed to on_action as soon as they arrive.
+    """
+    global _analysis_handle
+    if not _analysis_registration_tried:
+        register_analysis_code()
+    
+    if _analysis_handle:
+        payload = orjson.dumps({"handle": _analysis_handle, "args": analysis_request})
+    else:
+        # Embed the request directly in the Node code as a JSON literal
+        request_json = orjson.dumps(analysis_request).decode()
+        payload = orjson.dumps({"code": _NODE_TEMPLATE.replace("__REQ__", request_json)})
+    
+    try:
+        result = SESSION.post(
+            ANALYSIS_URL,
+            headers={"Content-Type": "application/json"},
+            data=payload,
+            timeout=30,
+            stream=True
+        )
+    except requests.RequestException as e:
+        logger.error("Analysis tool request failed: %s", e)
+        return None
+    
+    with result:
+        if result.ok:
+            try:
+                return read_analysis_stream(result, on_action)
+            except requests.RequestException as e:
+                logger.error("Analysis tool stream failed: %s", e)
+                return None
+        error_text = result.text
+    
+    if _analysis_handle:
+        # The tool may have restarted and dropped the handle; resend the full code
+        logger.warning("Analysis handle %s rejected, falling back to inline code", _analysis_handle)
+        _analysis_handle = None
+        return call_analysis_tool(analysis_request, on_action)
+    
+    logger.error("Analysis tool error: %s %s", result.status_code, error_text)
+    return None
+
+def read_analysis_stream(result, on_action=None):
+    """Collect analysis tool output line by line, handing streamed actions to on_action"""
+    lines = []
+    for raw_line in result.iter_lines():
+        line = raw_line.decode('utf-8', 'replace')
+        if line.startswith(_STREAM_ACTION_PREFIX):
+            if on_action is not None:
+                try:
+                    action = ClaudeAction.model_validate_json(line[len(_STREAM_ACTION_PREFIX):])
+                except ValidationError as e:
+                    logger.warning("Ignoring malformed streamed action: %s", e)
+                else:
+                    on_action(action.model_dump(exclude_none=True))
+            continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+def find_claude_json(analysis_output):
+    """Return the first JSON actions line in the analysis tool output, or None"""
+    match = _JSON_LINE_RE.search(analysis_output)
+    return match.group(1) if match else None
+
+def get_cached_claude_response(cache_key):
+    """Return a recent Claude response for the same normalized command, if any"""
+    with _CMD_CACHE_LOCK:
+        return _CMD_CACHE.get(cache_key)
+
+def cache_claude_response(cache_key, claude_response):
+    with _CMD_CACHE_LOCK:
+        _CMD_CACHE[cache_key] = claude_response
 
 def extract_claude_response(analysis_output):
     """Extract Claude's response from analysis tool output"""
     try:
         # Look for JSON in the output
-        lines = analysis_output.split('\n')
-        for line in lines:
-            if line.strip().startswith('{') and 'actions' in line:
-                return line.strip()
+        claude_json = find_claude_json(analysis_output)
+        if claude_json is not None:
+            return claude_json
         
         # If no JSON found, create a simple response
-        return json.dumps({
+        return orjson.dumps({
             "actions": [{"action": "respond", "text": "I processed your command but couldn't extract specific actions."}],
             "response": "I received your command and processed it."
-        })
+        }).decode()
         
     except Exception as e:
-        logger.error(f"Failed to extract Claude response: {e}")
-        return json.dumps({
+        logger.error("Failed to extract Claude response: %s", e)
+        return orjson.dumps({
             "actions": [{"action": "respond", "text": f"Error processing: {str(e)}"}],
             "response": "I had trouble processing your command."
-        })
+        }).decode()
 
 def create_fallback_response(command):
     """Create fallback when analysis tool fails"""
-    return json.dumps({
+    return orjson.dumps({
         "actions": [{"action": "respond", "text": f"I received your command: '{command}' but the analysis tool connection failed."}],
         "response": f"I heard: '{command}' but couldn't process it through the analysis tool."
-    })
+    }).decode()
 
 def parse_claude_actions(response):
     """Parse Claude's JSON response to extract actions"""
     try:
-        data = json.loads(response)
-        return data.get('actions', [])
+        plan = ClaudeActionPlan.model_validate_json(response)
+        return [action.model_dump(exclude_none=True) for action in plan.actions]
     except Exception as e:
-        logger.error(f"Failed to parse Claude response: {e}")
+        logger.error("Failed to parse Claude response: %s", e)
         return [{"action": "respond", "text": "I processed your command but couldn't extract specific actions."}]
 
 def execute_actions(actions):
     """Execute the actions returned by Claude"""
-    results = []
-    
-    for action in actions:
-        try:
-            result = execute_single_action(action)
-            results.append(result)
-        except Exception as e:
-            logger.error(f"Failed to execute action {action}: {e}")
-            results.append({"action": action.get("action", "unknown"), "status": "failed", "error": str(e)})
+    open_indices = [i for i, action in enumerate(actions) if action.get("action") == "open"]
+    if len(open_indices) < 2:
+        return list(_ACTION_POOL.map(_safe_execute_single, actions))
     
+    # Several opens share one osascript process; everything else runs on the pool
+    results = [None] * len(actions)
+    futures = {
+        i: _ACTION_POOL.submit(_safe_execute_single, action)
+        for i, action in enumerate(actions) if action.get("action") != "open"
+    }
+    batch_results = execute_open_actions_batch([actions[i] for i in open_indices])
+    for i, result in zip(open_indices, batch_results):
+        results[i] = result
+    for i, future in futures.items():
+        results[i] = future.result()
     return results
 
+def _safe_execute_single(action):
+    """Execute a single action, converting failures into an error result"""
+    try:
+        return execute_single_action(action)
+    except Exception as e:
+        logger.error("Failed to execute action %s: %s", action, e)
+        return {"action": action.get("action", "unknown"), "status": "failed", "error": str(e)}
+
 def execute_single_action(action):
     """Execute a single action"""
     action_type = action.get("action")
-    
-    if action_type == "open":
-        return execute_open_action(action)
-    elif action_type == "screenshot":
-        return execute_screenshot_action(action)
-    elif action_type == "respond":
-        return execute_response_action(action)
-    else:
+    handler = _ACTION_DISPATCH.get(action_type)
+    if handler is None:
         return {"action": action_type, "status": "not_implemented"}
+    return handler(action)
 
 def execute_open_action(action):
     """Execute open folder/file with enhanced visibility"""
     target = action.get("target", "")
     
     try:
-        # Handle known drives specifically
-        if target in ["2TB", "2TBHDD", "4TB SSD", "NAS RAID"]:
-            volume_path = f"/Volumes/{target}"
-            if os.path.exists(volume_path):
-                subprocess.run(["open", volume_path], check=True)
-                # Use AppleScript for better visibility
-                applescript = f'''
+        volume_path = resolve_open_volume(target)
+        if volume_path:
+            subprocess.run([OSASCRIPT, "-e", open_volume_script(volume_path)], check=False, close_fds=False)
+            return {"action": "open", "status": "success", "path": volume_path, "method": "enhanced"}
+        
+        return {"action": "open", "status": "not_found", "target": target}
+        
+    except Exception as e:
+        return {"action": "open", "status": "error", "error": str(e)}
+
+def execute_open_actions_batch(actions):
+    """Execute several open actions with a single osascript process reading from stdin"""
+    results = []
+    scripts = []
+    
+    for action in actions:
+        target = action.get("target", "")
+        try:
+            volume_path = resolve_open_volume(target)
+        except Exception as e:
+            results.append({"action": "open", "status": "error", "error": str(e)})
+            continue
+        if volume_path:
+            scripts.append(open_volume_script(volume_path))
+            results.append({"action": "open", "status": "success", "path": volume_path, "method": "enhanced"})
+        else:
+            results.append({"action": "open", "status": "not_found", "target": target})
+    
+    if scripts:
+        try:
+            subprocess.run([OSASCRIPT, "-"], input="\n".join(scripts), text=True, check=False, close_fds=False)
+        except Exception as e:
+            error = {"action": "open", "status": "error", "error": str(e)}
+            results = [error if result["status"] == "success" else result for result in results]
+    
+    return results
+
+def resolve_open_volume(target):
+    """Return the /Volumes path for a known, mounted drive, or None"""
+    # Handle known drives specifically
+    if target in _KNOWN_VOLUMES:
+        volume_path = f"/Volumes/{target}"
+        if volume_exists(volume_path):
+            return volume_path
+    return None
+
+def open_volume_script(volume_path):
+    """AppleScript that opens a volume in Finder and brings its window forward"""
+    # One AppleScript both opens the volume and positions the window
+    return f'''
                 tell application "Finder"
                     activate
                     open folder "{volume_path}" as POSIX file
                     set the position of the front window to {{100, 100}}
                 end tell
                 '''
-                subprocess.run(["osascript", "-e", applescript], check=False)
-                return {"action": "open", "status": "success", "path": volume_path, "method": "enhanced"}
-        
-        return {"action": "open", "status": "not_found", "target": target}
-        
-    except Exception as e:
-        return {"action": "open", "status": "error", "error": str(e)}
+
+@lru_cache(maxsize=32)
+def _volume_exists_cached(volume_path, time_bucket):
+    return os.path.exists(volume_path)
+
+def volume_exists(volume_path):
+    """Check a volume path, reusing the result for a few seconds (network volumes can be slow)"""
+    return _volume_exists_cached(volume_path, int(time.monotonic() // _VOLUME_CHECK_TTL))
+
+def capture_main_display(save_path):
+    """Write a PNG of the main display using CoreGraphics; returns False if capture failed"""
+    image = CGDisplayCreateImage(CGMainDisplayID())
+    if image is None:
+        return False
+    url = NSURL.fileURLWithPath_(save_path)
+    destination = CGImageDestinationCreateWithURL(url, 'public.png', 1, None)
+    if destination is None:
+        return False
+    CGImageDestinationAddImage(destination, image, None)
+    return bool(CGImageDestinationFinalize(destination))
 
 def execute_screenshot_action(action):
     """Execute screenshot"""
     try:
         save_path = action.get("save_path", "/Users/mark/Desktop/screenshot.png")
-        subprocess.run(["screencapture", save_path], check=True)
+        if QUARTZ_AVAILABLE and capture_main_display(save_path):
+            return {"action": "screenshot", "status": "success", "path": save_path, "method": "quartz"}
+        subprocess.run([SCREENCAPTURE, save_path], check=True, close_fds=False)
         return {"action": "screenshot", "status": "success", "path": save_path}
     except Exception as e:
         return {"action": "screenshot", "status": "error", "error": str(e)}
@@ -253,9 +584,17 @@ def execute_screenshot_action(action):
 def execute_response_action(action):
     """Log voice response"""
     text = action.get("text", "")
-    logger.info(f"Voice Response: {text}")
+    logger.info("Voice Response: %s", text)
     return {"action": "response", "status": "logged", "text": text}
 
+# Action type -> handler used by execute_single_action
+_ACTION_DISPATCH = {
+    "open": execute_open_action,
+    "screenshot": execute_screenshot_action,
+    "respond": execute_response_action,
+}
+
 if __name__ == '__main__':
+    # Development server only; use the gunicorn entrypoint above in production
     logger.info("Starting Claude API Bridge Service on port 8091")
-    app.run(host='0.0.0.0', port=8091, debug=False)
+    app.run(host='0.0.0.0', port=8091, debug=False, threaded=True)
@@ -5,40 +5,400 @@ Sends voice commands to Claude for interpretation and execution
 """
 
 import asyncio
+import fnmatch
 import json
 import logging
 import os
+import re
 import subprocess
-import requests
-from typing import Dict, Any, List
+import time
+import weakref
+import httpx
+from typing import Dict, Any, List, Callable, Optional, Set, Tuple
+from collections import OrderedDict, deque
 from datetime import datetime
 
+# orjson on the hot path when available, stdlib json otherwise
+try:
+    import orjson
+    
+    def json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+    
+    json_dumps_bytes = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    json_dumps = json.dumps
+    
+    def json_dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+    
+    json_loads = json.loads
+
+CLAUDE_API_URL = "https://api.anthropic.com/v1/messages"
+
+SERVICE_ENDPOINTS = {
+    "memory": "http://localhost:8081",
+    "finder": "http://localhost:8082",
+    "screen": "http://localhost:8083",
+    "whisper": "http://localhost:8085"
+}
+
+# Static system prompt; kept byte-identical across calls so Anthropic's prompt cache can hit
+SYSTEM_PROMPT = """You are Claude, an AI assistant integrated with a macOS automation system. The user is speaking to you via voice commands. You can execute actions on their Mac.
+
+Available Actions:
+1. MEMORY - Store/retrieve information: {"action": "memory", "operation": "store/search", "content": "...", "category": "..."}
+2. FINDER - File operations: {"action": "finder", "operation": "organize/search/move/open", "path": "...", "pattern": "..."}  
+3. SCREEN - Screenshots/OCR: {"action": "screen", "operation": "capture/ocr", "save_path": "..."}
+4. OPEN - Open files/folders: {"action": "open", "target": "path or name", "type": "folder/file/app"}
+5. SEARCH - Search filesystem: {"action": "search", "path": "starting path", "pattern": "file pattern like *.eml,*.msg,*.mbox", "type": "files/folders"}
+6. RESPOND - Voice response: {"action": "respond", "text": "your response to the user"}
+
+For complex multi-step tasks, break them into multiple actions. For email searches, use patterns like *.eml,*.msg,*.mbox,*.mailbox.
+
+Respond with a single compact JSON object and nothing else, listing actions first:
+{"actions": [{"action": "...", ...}, {"action": "...", ...}], "response": "one short sentence for the user"}
+
+Be conversational and helpful. Execute actions when the user requests them."""
+
+# Model routing: single-intent commands go to Haiku, multi-step ones to Sonnet
+SIMPLE_MODEL = "claude-haiku-4-5"
+COMPLEX_MODEL = "claude-sonnet-4-20250514"
+_SIMPLE_COMMAND_RE = re.compile(r"\b(screenshot|capture|open|organize|remember|note|save)\b")
+_COMPLEX_COMMAND_RE = re.compile(r"\b(and|then|each|every|after|before)\b")
+
+# Interpretation cache for repeated commands (actions still execute every time)
+INTERP_CACHE_SIZE = 128
+INTERP_CACHE_TTL = 300  # seconds
+
+# Commands quoting variable content (e.g. a note to remember) are never cached
+_QUOTED_CONTENT_RE = re.compile(r'["\u201c\u201d]')
+
+# Simulated replies used by enhanced_simulate_claude_response when Claude is unreachable
+EMAIL_FILE_PATTERN = "*.eml,*.msg,*.mbox,*.mailbox"
+
+_NAS_RAID_EMAIL_REPLY = "ACTIONS: " + json_dumps([
+    {"action": "search", "path": "/Volumes/NAS RAID", "pattern": EMAIL_FILE_PATTERN, "type": "files"},
+    {"action": "search", "path": "/Users/mark/Desktop/NAS RAID", "pattern": EMAIL_FILE_PATTERN, "type": "files"},
+    {"action": "search", "path": "/Users/mark/Documents/NAS RAID", "pattern": EMAIL_FILE_PATTERN, "type": "files"},
+    {"action": "respond", "text": "I'm searching the NAS RAID folder and its subfolders for email files. If I find any, I'll open the folders containing them."}
+]) + """
+RESPONSE: I'll search the NAS RAID folder for email files and open any folders that contain them. Let me check multiple possible locations for this folder."""
+
+_FOLDER_SEARCH_RESPOND_TEMPLATE = "I'm searching for email files in the {folder_name}. If I find any, I'll open the folders containing them."
+_FOLDER_SEARCH_REPLY_TEMPLATE = """ACTIONS: {actions_json}
+RESPONSE: I'm searching for email files in the {folder_name}. This is a complex multi-step task - I'll check multiple locations and open any folders containing emails."""
+
+_MULTI_STEP_REPLY = """ACTIONS: [{"action": "respond", "text": "This is a complex multi-step command that I'm processing. For the best results with commands like this, the system should use the real Claude API for sophisticated reasoning."}]
+RESPONSE: I understand this is a complex command with multiple steps. I'm doing my best to process it, but commands like this work better with full Claude AI integration."""
+
+def _simulate_nas_raid_email_search(command_text: str, command_lower: str) -> str:
+    """Handle the specific NAS RAID email search command"""
+    return _NAS_RAID_EMAIL_REPLY
+
+# Whitespace-delimited word immediately preceding a standalone "folder" token
+_FOLDER_RX = re.compile(r"(?<!\S)(\S+)\s+folder(?!\S)")
+
+def _simulate_folder_search(command_text: str, command_lower: str) -> str:
+    """Complex file searching commands"""
+    # Try to extract folder name (the word right before "folder")
+    m = _FOLDER_RX.search(command_lower)
+    folder_name = m.group(1) if m else "specified folder"
+    
+    actions = [
+        {"action": "search", "path": f"/Users/mark/Desktop/{folder_name}", "pattern": EMAIL_FILE_PATTERN, "type": "files"},
+        {"action": "search", "path": f"/Users/mark/Documents/{folder_name}", "pattern": EMAIL_FILE_PATTERN, "type": "files"},
+        {"action": "respond", "text": _FOLDER_SEARCH_RESPOND_TEMPLATE.format(folder_name=folder_name)}
+    ]
+    return _FOLDER_SEARCH_REPLY_TEMPLATE.format(actions_json=json_dumps(actions), folder_name=folder_name)
+
+def _simulate_multi_step(command_text: str, command_lower: str) -> str:
+    """Multi-step commands joined with 'and'"""
+    return _MULTI_STEP_REPLY
+
+# Checked in order against the lowercased command; lookaheads keep the original
+# "all of these substrings appear anywhere" semantics in a single compiled pattern
+_ENHANCED_HANDLERS = (
+    (re.compile(r"(?=.*nas raid)(?=.*email)(?=.*(?:look|see))", re.S), _simulate_nas_raid_email_search),
+    (re.compile(r"(?=.*(?:look|search|find))(?=.*(?:folder|directory))", re.S), _simulate_folder_search),
+    (re.compile(r"(?=.* and )(?=.*(?:open|find))", re.S), _simulate_multi_step),
+)
+
+# Single-pass keyword scan for the same dispatch, when pyahocorasick is installed
+try:
+    import ahocorasick
+    
+    _DISPATCH_KEYWORDS = ("nas raid", "email", "look", "see", "search", "find",
+                          "folder", "directory", " and ", "open")
+    _DISPATCH_AC = ahocorasick.Automaton()
+    for _keyword in _DISPATCH_KEYWORDS:
+        _DISPATCH_AC.add_word(_keyword, _keyword)
+    _DISPATCH_AC.make_automaton()
+except ImportError:
+    _DISPATCH_AC = None
+
+def _match_enhanced_handler(command_lower: str) -> Optional[Callable[[str, str], str]]:
+    """Return the first enhanced-simulation handler whose keywords all occur in the command"""
+    if _DISPATCH_AC is None:
+        for pattern, handler in _ENHANCED_HANDLERS:
+            if pattern.search(command_lower):
+                return handler
+        return None
+    
+    hits = {keyword for _, keyword in _DISPATCH_AC.iter(command_lower)}
+    if {"nas raid", "email"} <= hits and hits & {"look", "see"}:
+        return _simulate_nas_raid_email_search
+    if hits & {"look", "search", "find"} and hits & {"folder", "directory"}:
+        return _simulate_folder_search
+    if " and " in hits and hits & {"open", "find"}:
+        return _simulate_multi_step
+    return None
+
+# Backpressure for concurrent voice commands: cap in-flight Claude calls (avoids 429s)
+# and filesystem searches (avoids file descriptor exhaustion)
+CONCURRENCY_LIMITS = {"claude": 4, "find": 8}
+_loop_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = \
+    weakref.WeakKeyDictionary()
+
+def _semaphore(kind: str) -> asyncio.Semaphore:
+    """The running loop's semaphore for kind ("claude" or "find"), created inside the loop on first use.
+    
+    Before Python 3.10 a semaphore binds to the loop current at construction, so
+    module-level ones break under any other loop (uvicorn, asyncio.run).
+    """
+    loop = asyncio.get_running_loop()
+    semaphores = _loop_semaphores.get(loop)
+    if semaphores is None:
+        semaphores = _loop_semaphores[loop] = {
+            name: asyncio.Semaphore(limit) for name, limit in CONCURRENCY_LIMITS.items()
+        }
+    return semaphores[kind]
+
+# How long a resolved "open folder" target is reused without re-probing
+FOLDER_CACHE_TTL = 60  # seconds
+
+# Filesystem search limits (mirrors the old `find -maxdepth 4` with a 10 s timeout)
+SEARCH_MAX_DEPTH = 4
+SEARCH_MAX_RESULTS = 50
+SEARCH_TIMEOUT = 10  # seconds
+
+# Memory writes are coalesced into one /store_batch POST per window
+STORE_BATCH_MAX = 32
+STORE_BATCH_WINDOW = 0.05  # seconds
+
+def walk_matching(root: str, patterns: List[str], want_dirs: bool, max_depth: int,
+                  limit: int, timeout: float) -> Tuple[List[str], bool]:
+    """Breadth-first os.scandir walk returning paths whose name matches any pattern.
+    
+    Like find, symlinks are not followed and matching is case-sensitive. Stops after
+    `limit` matches or `timeout` seconds; returns (matches, timed_out).
+    """
+    deadline = time.monotonic() + timeout
+    found = []
+    seen = set()
+    queue = deque([(root, 1)])
+    
+    while queue:
+        if time.monotonic() > deadline:
+            return found, True
+        directory, depth = queue.popleft()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        is_match_type = is_dir if want_dirs else entry.is_file(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if is_match_type and entry.path not in seen and any(
+                        fnmatch.fnmatchcase(entry.name, p) for p in patterns
+                    ):
+                        seen.add(entry.path)
+                        found.append(entry.path)
+                        if len(found) >= limit:
+                            return found, False
+                    if is_dir and depth < max_depth:
+                        queue.append((entry.path, depth + 1))
+        except OSError:
+            continue
+    
+    return found, False
+
 class ConversationalVoiceProcessor:
     """Processes voice commands through Claude AI"""
     
     def __init__(self):
-        self.claude_api_url = "https://api.anthropic.com/v1/messages"
-        self.service_endpoints = {
-            "memory": "http://localhost:8081",
-            "finder": "http://localhost:8082", 
-            "screen": "http://localhost:8083",
-            "whisper": "http://localhost:8085"
-        }
+        self.claude_api_url = CLAUDE_API_URL
+        self.service_endpoints = SERVICE_ENDPOINTS
+        
+        # Anthropic headers are only sent to the Claude API, never to local services
+        self.claude_headers = {"anthropic-version": "2023-06-01"}
+        api_key = os.environ.get("ANTHROPIC_API_KEY")
+        if api_key:
+            self.claude_headers["x-api-key"] = api_key
+        
+        # Shared async HTTP client so Claude and local service calls reuse connections
+        self._http = httpx.AsyncClient(
+            timeout=30,
+            headers={"Content-Type": "application/json"},
+            limits=httpx.Limits(max_keepalive_connections=20)
+        )
+        
+        # normalized command -> (cached_at, claude_response, actions)
+        self._interp_cache: "OrderedDict[str, Tuple[float, str, List[Dict[str, Any]]]]" = OrderedDict()
+        
+        # open target -> (resolved_at, folder path)
+        self._folder_cache: Dict[str, Tuple[float, str]] = {}
+        
+        # Strong references to fire-and-forget tasks so they aren't garbage collected
+        self._background_tasks: Set[asyncio.Task] = set()
+        
+        # Pending memory writes as (payload, future resolving to the stored id)
+        self._store_queue: "asyncio.Queue[Tuple[Dict[str, Any], asyncio.Future]]" = asyncio.Queue()
+        self._store_flusher: Optional[asyncio.Task] = None
+        
+        # normalized command -> future for the run currently processing it
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    async def aclose(self) -> None:
+        """Finish background work and close the shared HTTP client"""
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        if self._store_flusher is not None:
+            await self._store_queue.join()
+            self._store_flusher.cancel()
+        await self._http.aclose()
+    
+    def _enqueue_store(self, payload: Dict[str, Any]) -> asyncio.Future:
+        """Queue a memory write for the next batch; the future resolves to its id"""
+        if self._store_flusher is None:
+            self._store_flusher = asyncio.create_task(self._flush_stores())
+        future = asyncio.get_running_loop().create_future()
+        self._store_queue.put_nowait((payload, future))
+        return future
+    
+    async def _flush_stores(self) -> None:
+        """Drain queued memory writes: up to STORE_BATCH_MAX items or STORE_BATCH_WINDOW, whichever first"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._store_queue.get()]
+            deadline = loop.time() + STORE_BATCH_WINDOW
+            while len(batch) < STORE_BATCH_MAX:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._store_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self._post_store_batch(batch)
+            finally:
+                for _ in batch:
+                    self._store_queue.task_done()
+    
+    async def _post_store_batch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        """POST one batch to the memory service and resolve each caller's future"""
+        try:
+            response = await self._http.post(
+                f"{self.service_endpoints['memory']}/store_batch",
+                content=json_dumps_bytes([payload for payload, _ in batch])
+            )
+            # A rejected batch fails every caller instead of resolving them to id None
+            response.raise_for_status()
+            ids = json_loads(response.content).get("ids", [])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(ids[i] if i < len(ids) else None)
+    
+    def _run_in_background(self, coro) -> None:
+        """Schedule a fire-and-forget coroutine, holding a reference until it finishes"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_task_done)
+    
+    def _background_task_done(self, task: asyncio.Task) -> None:
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logging.error(f"Background task failed: {task.exception()}")
         
     async def process_voice_command(self, command_text: str, context: Dict = None) -> Dict[str, Any]:
         """Process voice command through Claude and execute actions"""
         
-        # Step 1: Send to Claude for interpretation
-        claude_response = await self.send_to_claude(command_text, context)
+        # Singleflight: a duplicate of a command still in flight (e.g. a double wake-word
+        # trigger) shares the first run's result instead of executing the actions again
+        inflight_key = " ".join(command_text.lower().split())
+        if inflight_key in self._inflight:
+            return await asyncio.shield(self._inflight[inflight_key])
         
-        # Step 2: Parse Claude's response for actions
-        actions = self.parse_claude_response(claude_response)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[inflight_key] = future
+        try:
+            result = await self._process_voice_command(command_text, context)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved so an unshared failure isn't logged twice
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[inflight_key]
+    
+    async def _process_voice_command(self, command_text: str, context: Dict = None) -> Dict[str, Any]:
+        """Interpret and execute a single voice command"""
+        
+        cache_key = self._interp_cache_key(command_text)
+        cached = self._get_cached_interpretation(cache_key)
+        
+        # Actions start as soon as Claude has streamed the ACTIONS block
+        started = {}
+        
+        def start_actions(actions: List[Dict[str, Any]]) -> None:
+            started["actions"] = actions
+            started["task"] = asyncio.create_task(self.execute_actions(actions))
         
-        # Step 3: Execute recommended actions
-        execution_results = await self.execute_actions(actions)
+        if cached:
+            # Repeat command: reuse the interpretation, skip the Claude round-trip
+            claude_response, actions = cached
+            start_actions(actions)
+        else:
+            # Step 1: Send to Claude for interpretation
+            claude_response = await self.send_to_claude(
+                command_text, context, on_actions=start_actions, fallback=False
+            )
+            if claude_response is None:
+                claude_response = self.enhanced_simulate_claude_response(command_text, command_text.lower())
+                cache_key = None  # don't pin a simulated reply while Claude is unreachable
+        
+        if started:
+            # Steps 2-3 already running while the RESPONSE text streamed in
+            actions = started["actions"]
+            execution_results = await started["task"]
+        else:
+            # Step 2: Parse Claude's response for actions
+            actions = self.parse_claude_response(claude_response)
+            
+            # Step 3: Execute recommended actions
+            execution_results = await self.execute_actions(actions)
         
-        # Step 4: Store interaction in memory
-        await self.store_interaction(command_text, claude_response, execution_results)
+        # Only a reply that parsed to real actions is worth replaying; failures are retried next time
+        if cache_key and not cached and self._json_actions(claude_response):
+            self._cache_interpretation(cache_key, claude_response, actions)
+        
+        # Step 4: Store interaction in memory (in the background; the caller doesn't wait on it)
+        self._run_in_background(self.store_interaction(command_text, claude_response, execution_results))
         
         return {
             "command": command_text,
@@ -48,67 +408,103 @@ class ConversationalVoiceProcessor:
             "timestamp": datetime.now().isoformat()
         }
     
-    async def send_to_claude(self, command_text: str, context: Dict = None) -> str:
-        """Send voice command to Claude for interpretation"""
+    def _select_model(self, command_text: str) -> str:
+        """Pick Haiku for simple single-action commands, Sonnet for everything else"""
+        command_lower = command_text.lower()
+        if _SIMPLE_COMMAND_RE.search(command_lower) and not _COMPLEX_COMMAND_RE.search(command_lower):
+            return SIMPLE_MODEL
+        return COMPLEX_MODEL
+    
+    def _interp_cache_key(self, command_text: str) -> Optional[str]:
+        """Normalized cache key, or None for commands that shouldn't be cached"""
+        if _QUOTED_CONTENT_RE.search(command_text):
+            return None
+        return " ".join(command_text.lower().split())
+    
+    def _get_cached_interpretation(self, cache_key: Optional[str]) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """Return a fresh cached (claude_response, actions) pair, if any"""
+        if not cache_key or cache_key not in self._interp_cache:
+            return None
+        cached_at, claude_response, actions = self._interp_cache[cache_key]
+        if time.monotonic() - cached_at > INTERP_CACHE_TTL:
+            del self._interp_cache[cache_key]
+            return None
+        self._interp_cache.move_to_end(cache_key)
+        return claude_response, actions
+    
+    def _cache_interpretation(self, cache_key: str, claude_response: str, actions: List[Dict[str, Any]]) -> None:
+        self._interp_cache[cache_key] = (time.monotonic(), claude_response, actions)
+        self._interp_cache.move_to_end(cache_key)
+        while len(self._interp_cache) > INTERP_CACHE_SIZE:
+            self._interp_cache.popitem(last=False)
+    
+    async def send_to_claude(self, command_text: str, context: Dict = None,
+                             on_actions: Callable[[List[Dict[str, Any]]], None] = None,
+                             fallback: bool = True) -> Optional[str]:
+        """Send voice command to Claude for interpretation
+        
+        The reply is streamed; once the actions are complete (the "response" key or
+        RESPONSE: marker has arrived) the parsed actions are handed to on_actions. If Claude can't be
+        reached the simulated response is returned, or None when fallback is False.
+        """
         
-        system_prompt = """You are Claude, an AI assistant integrated with a macOS automation system. The user is speaking to you via voice commands. You can execute actions on their Mac.
-
-Available Actions:
-1. MEMORY - Store/retrieve information: {"action": "memory", "operation": "store/search", "content": "...", "category": "..."}
-2. FINDER - File operations: {"action": "finder", "operation": "organize/search/move/open", "path": "...", "pattern": "..."}  
-3. SCREEN - Screenshots/OCR: {"action": "screen", "operation": "capture/ocr", "save_path": "..."}
-4. OPEN - Open files/folders: {"action": "open", "target": "path or name", "type": "folder/file/app"}
-5. SEARCH - Search filesystem: {"action": "search", "path": "starting path", "pattern": "file pattern like *.eml,*.msg,*.mbox", "type": "files/folders"}
-6. RESPOND - Voice response: {"action": "respond", "text": "your response to the user"}
-
-For complex multi-step tasks, break them into multiple actions. For email searches, use patterns like *.eml,*.msg,*.mbox,*.mailbox.
-
-Format your response as:
-ACTIONS: [{"action": "...", ...}, {"action": "...", ...}]
-RESPONSE: Your natural response to the user
-
-Be conversational and helpful. Execute actions when the user requests them."""
-
         user_message = f"Voice command: '{command_text}'"
         if context:
-            user_message += f"\nContext: {json.dumps(context, indent=2)}"
+            user_message += f"\nContext: {json_dumps(context)}"
 
+        model = self._select_model(command_text)
         payload = {
-            "model": "claude-sonnet-4-20250514",
-            "max_tokens": 1500,
+            "model": model,
+            "max_tokens": 256 if model == SIMPLE_MODEL else 400,
             "messages": [
                 {"role": "user", "content": user_message}
             ],
-            "system": system_prompt
+            "system": [
+                {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+            ]
         }
         
+        text = ""
+        actions_sent = False
+        
         try:
-            # Use the Claude API (using requests since we're in Python)
-            import requests
-            
-            response = requests.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={
-                    "Content-Type": "application/json",
-                },
-                json=payload,
-                timeout=30
-            )
+            async with _semaphore("claude"), self._http.stream("POST", self.claude_api_url, headers=self.claude_headers,
+                                                     content=json_dumps_bytes({**payload, "stream": True})) as response:
+                if response.status_code != 200:
+                    logging.error(f"Claude API error: {response.status_code}")
+                    return self.enhanced_simulate_claude_response(command_text) if fallback else None
+                
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    event = json_loads(line[6:])
+                    event_type = event.get("type")
+                    
+                    if event_type == "message_start":
+                        usage = event.get("message", {}).get("usage", {})
+                        logging.info(f"Claude prompt cache: read={usage.get('cache_read_input_tokens', 0)} "
+                                     f"created={usage.get('cache_creation_input_tokens', 0)}")
+                    elif event_type == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                        text += event["delta"]["text"]
+                        if on_actions and not actions_sent:
+                            streamed_actions = self.parse_streamed_actions(text)
+                            if streamed_actions is not None:
+                                actions_sent = True
+                                on_actions(streamed_actions)
             
-            if response.status_code == 200:
-                data = response.json()
-                return data['content'][0]['text']
-            else:
-                logging.error(f"Claude API error: {response.status_code}")
-                return self.enhanced_simulate_claude_response(command_text)
+            return text
                 
         except Exception as e:
             logging.error(f"Failed to contact Claude: {e}")
-            return self.enhanced_simulate_claude_response(command_text)
+            if actions_sent:
+                # Actions are already running; keep what was streamed rather than simulating
+                return text
+            return self.enhanced_simulate_claude_response(command_text) if fallback else None
     
-    def simulate_claude_response(self, command_text: str) -> str:
+    def simulate_claude_response(self, command_text: str, command_lower: Optional[str] = None) -> str:
         """Simulate Claude's response for common commands"""
-        command_lower = command_text.lower()
+        if command_lower is None:
+            command_lower = command_text.lower()
         
         if "screenshot" in command_lower or "capture" in command_lower:
             return '''ACTIONS: [{"action": "screen", "operation": "capture", "save_path": "/Users/mark/Desktop/screenshot.png"}, {"action": "respond", "text": "I've taken a screenshot and saved it to your desktop."}]
@@ -116,7 +512,7 @@ RESPONSE: I've taken a screenshot for you and saved it to your desktop.'''
 
         elif "open" in command_lower and ("folder" in command_lower or "directory" in command_lower):
             # Extract folder name from command
-            folder_name = command_text.lower().replace("open", "").replace("the", "").replace("folder", "").replace(",", "").strip()
+            folder_name = command_lower.replace("open", "").replace("the", "").replace("folder", "").replace(",", "").strip()
             return f'''ACTIONS: [{{"action": "open", "target": "{folder_name}", "type": "folder"}}, {{"action": "respond", "text": "I'm opening the {folder_name} folder for you."}}]
 RESPONSE: I'm opening the {folder_name} folder for you.'''
 
@@ -134,64 +530,35 @@ RESPONSE: I've saved that information to your memory system.'''
 RESPONSE: Let me search your memories for that information.'''
 
         else:
-            return f'''ACTIONS: [{"action": "respond", "text": "I heard you say: {command_text}. I'm not sure how to help with that specific request yet."}]
+            return f'''ACTIONS: [{{"action": "respond", "text": "I heard you say: {command_text}. I'm not sure how to help with that specific request yet."}}]
 RESPONSE: I heard you say: "{command_text}". I'm not sure how to help with that specific request yet, but I'm learning!'''
     
-    def enhanced_simulate_claude_response(self, command_text: str) -> str:
+    def enhanced_simulate_claude_response(self, command_text: str, command_lower: Optional[str] = None) -> str:
         """Enhanced simulation that handles complex commands"""
-        command_lower = command_text.lower()
-        
-        # Handle the specific NAS RAID email search command
-        if "nas raid" in command_lower and "email" in command_lower and ("look" in command_lower or "see" in command_lower):
-            actions = [
-                {"action": "search", "path": "/Volumes/NAS RAID", "pattern": "*.eml,*.msg,*.mbox,*.mailbox", "type": "files"},
-                {"action": "search", "path": "/Users/mark/Desktop/NAS RAID", "pattern": "*.eml,*.msg,*.mbox,*.mailbox", "type": "files"},
-                {"action": "search", "path": "/Users/mark/Documents/NAS RAID", "pattern": "*.eml,*.msg,*.mbox,*.mailbox", "type": "files"},
-                {"action": "respond", "text": "I'm searching the NAS RAID folder and its subfolders for email files. If I find any, I'll open the folders containing them."}
-            ]
-            actions_json = json.dumps(actions)
-            return f'''ACTIONS: {actions_json}
-RESPONSE: I'll search the NAS RAID folder for email files and open any folders that contain them. Let me check multiple possible locations for this folder.'''
-        
-        # Complex file searching commands
-        elif ("look" in command_lower or "search" in command_lower or "find" in command_lower) and ("folder" in command_lower or "directory" in command_lower):
-            # Extract folder name and search criteria
-            actions = []
-            
-            # Try to extract folder name
-            words = command_lower.split()
-            folder_name = "specified folder"
-            for i, word in enumerate(words):
-                if word == "folder" and i > 0:
-                    folder_name = words[i-1]
-                    break
-            
-            actions.append({"action": "search", "path": f"/Users/mark/Desktop/{folder_name}", "pattern": "*.eml,*.msg,*.mbox,*.mailbox", "type": "files"})
-            actions.append({"action": "search", "path": f"/Users/mark/Documents/{folder_name}", "pattern": "*.eml,*.msg,*.mbox,*.mailbox", "type": "files"})
-            actions.append({"action": "respond", "text": f"I'm searching for email files in the {folder_name}. If I find any, I'll open the folders containing them."})
-            
-            actions_json = json.dumps(actions)
-            return f'''ACTIONS: {actions_json}
-RESPONSE: I'm searching for email files in the {folder_name}. This is a complex multi-step task - I'll check multiple locations and open any folders containing emails.'''
+        if command_lower is None:
+            command_lower = command_text.lower()
         
-        # Multi-step commands with "and"
-        elif " and " in command_lower and ("open" in command_lower or "find" in command_lower):
-            return f'''ACTIONS: [{{"action": "respond", "text": "This is a complex multi-step command that I'm processing. For the best results with commands like this, the system should use the real Claude API for sophisticated reasoning."}}]
-RESPONSE: I understand this is a complex command with multiple steps. I'm doing my best to process it, but commands like this work better with full Claude AI integration.'''
+        handler = _match_enhanced_handler(command_lower)
+        if handler is not None:
+            return handler(command_text, command_lower)
         
         # Fall back to simple simulation
-        else:
-            return self.simulate_claude_response(command_text)
+        return self.simulate_claude_response(command_text, command_lower)
     
     def parse_claude_response(self, response: str) -> List[Dict[str, Any]]:
         """Parse Claude's response to extract actions"""
         actions = []
         
         try:
-            # Look for ACTIONS: line
+            # Current format: one JSON object with "actions" and "response"; a reply cut off
+            # at max_tokens fails to decode and gets the fallback below instead of no actions
+            if response.lstrip().startswith("{"):
+                return json_loads(response).get("actions", [])
+            
+            # Legacy format (and the simulator): ACTIONS: line followed by RESPONSE:
             if "ACTIONS:" in response:
                 actions_line = response.split("ACTIONS:")[1].split("RESPONSE:")[0].strip()
-                actions = json.loads(actions_line)
+                actions = json_loads(actions_line)
         except Exception as e:
             logging.error(f"Failed to parse Claude response: {e}")
             # Fallback: create a simple response action
@@ -199,17 +566,52 @@ RESPONSE: I understand this is a complex command with multiple steps. I'm doing
         
         return actions
     
+    def _json_actions(self, response: str) -> Optional[List[Dict[str, Any]]]:
+        """Non-empty actions list parsed from valid JSON in Claude's reply, else None"""
+        try:
+            if response.lstrip().startswith("{"):
+                actions = json_loads(response).get("actions")
+            elif "ACTIONS:" in response:
+                actions = json_loads(response.split("ACTIONS:")[1].split("RESPONSE:")[0].strip())
+            else:
+                return None
+        except (ValueError, AttributeError):
+            return None
+        return actions if isinstance(actions, list) and actions else None
+    
+    def parse_streamed_actions(self, partial: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the actions once they are complete in a partially streamed reply, else None"""
+        if "ACTIONS:" in partial and "RESPONSE:" in partial:
+            return self.parse_claude_response(partial)
+        
+        # JSON replies list actions first, so everything before "response" is complete;
+        # if "response" comes first the actions are still streaming and must wait for the full reply
+        response_key = partial.find('"response"')
+        actions_key = partial.find('"actions"')
+        if not 0 <= actions_key < response_key or not partial.lstrip().startswith("{"):
+            return None
+        try:
+            head = partial[:response_key].rstrip().rstrip(",") + "}"
+            actions = json_loads(head).get("actions")
+        except ValueError:
+            return None
+        return actions if isinstance(actions, list) else None
+    
     async def execute_actions(self, actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Execute the actions recommended by Claude"""
-        results = []
+        # Actions are independent I/O, so run them together; gather keeps the input order
+        outcomes = await asyncio.gather(
+            *(self.execute_single_action(action) for action in actions),
+            return_exceptions=True
+        )
         
-        for action in actions:
-            try:
-                result = await self.execute_single_action(action)
-                results.append(result)
-            except Exception as e:
-                logging.error(f"Failed to execute action {action}: {e}")
-                results.append({"action": action, "status": "failed", "error": str(e)})
+        results = []
+        for action, outcome in zip(actions, outcomes):
+            if isinstance(outcome, Exception):
+                logging.error(f"Failed to execute action {action}: {outcome}")
+                results.append({"action": action, "status": "failed", "error": str(outcome)})
+            else:
+                results.append(outcome)
         
         return results
     
@@ -244,13 +646,13 @@ RESPONSE: I understand this is a complex command with multiple steps. I'm doing
                 "timestamp": datetime.now().timestamp()
             }
             
-            response = requests.post(f"{self.service_endpoints['memory']}/store", json=payload)
-            return {"action": "memory_store", "status": "success", "id": response.json().get("id")}
+            memory_id = await self._enqueue_store(payload)
+            return {"action": "memory_store", "status": "success", "id": memory_id}
             
         elif operation == "search":
             payload = {"query": action.get("query", ""), "limit": 5}
-            response = requests.post(f"{self.service_endpoints['memory']}/text_search", json=payload)
-            return {"action": "memory_search", "status": "success", "results": response.json().get("results", [])}
+            response = await self._http.post(f"{self.service_endpoints['memory']}/text_search", content=json_dumps_bytes(payload))
+            return {"action": "memory_search", "status": "success", "results": json_loads(response.content).get("results", [])}
     
     async def execute_finder_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
         """Execute file operations"""
@@ -258,7 +660,7 @@ RESPONSE: I understand this is a complex command with multiple steps. I'm doing
         
         if operation == "organize":
             payload = {"directory": action.get("path", "/Users/mark/Downloads")}
-            response = requests.post(f"{self.service_endpoints['finder']}/smart_organize", json=payload)
+            response = await self._http.post(f"{self.service_endpoints['finder']}/smart_organize", content=json_dumps_bytes(payload))
             return {"action": "finder_organize", "status": "success"}
     
     async def execute_screen_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
@@ -266,16 +668,36 @@ RESPONSE: I understand this is a complex command with multiple steps. I'm doing
         operation = action.get("operation")
         
         if operation == "capture":
-            response = requests.post(f"{self.service_endpoints['screen']}/capture_screen")
+            response = await self._http.post(f"{self.service_endpoints['screen']}/capture_screen")
             return {"action": "screen_capture", "status": "success"}
     
+    async def run_find(self, *args: str, timeout: float = None) -> str:
+        """Run find without blocking the event loop and return its stdout"""
+        async with _semaphore("find"):
+            proc = await asyncio.create_subprocess_exec(
+                "find", *args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            try:
+                stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise
+        return stdout.decode(errors="replace")
+    
+    async def run_open(self, path: str, check: bool = False) -> None:
+        """Run open on path without blocking the event loop"""
+        proc = await asyncio.create_subprocess_exec("open", path)
+        if await proc.wait() != 0 and check:
+            raise subprocess.CalledProcessError(proc.returncode, ["open", path])
+    
     async def execute_open_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
         """Execute open operations (folders, files, apps)"""
         target = action.get("target", "")
         action_type = action.get("type", "folder")
         
-        import subprocess
-        
         try:
             if action_type == "folder":
                 # Try to find and open the folder
@@ -288,26 +710,34 @@ RESPONSE: I understand this is a complex command with multiple steps. I'm doing
                     f"/Users/mark/Desktop/Job Interviews" if "job" in target.lower() and "interview" in target.lower() else None
                 ]
                 
+                # Recently resolved targets skip the filesystem probes entirely
+                cached = self._folder_cache.get(target)
+                if cached and time.monotonic() - cached[0] <= FOLDER_CACHE_TTL:
+                    await self.run_open(cached[1], check=True)
+                    return {"action": "open_folder", "status": "success", "path": cached[1]}
+                
                 # Filter out None values
                 possible_paths = [p for p in possible_paths if p is not None]
                 
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        subprocess.run(["open", path], check=True)
-                        return {"action": "open_folder", "status": "success", "path": path}
+                # Probe all candidates at once and take the first that exists
+                loop = asyncio.get_running_loop()
+                exists = await asyncio.gather(*(loop.run_in_executor(None, os.path.exists, p) for p in possible_paths))
+                found_path = next((p for p, found in zip(possible_paths, exists) if found), None)
                 
-                # If not found, try to search for it
-                search_result = subprocess.run(
-                    ["find", "/Users/mark", "-type", "d", "-iname", f"*{target}*", "-maxdepth", "3"],
-                    capture_output=True, text=True
-                )
+                if found_path is None:
+                    # If not found, try to search for it
+                    search_output = await self.run_find(
+                        "/Users/mark", "-type", "d", "-iname", f"*{target}*", "-maxdepth", "3"
+                    )
+                    if search_output.strip():
+                        found_path = search_output.strip().split('\n')[0]
                 
-                if search_result.stdout.strip():
-                    found_path = search_result.stdout.strip().split('\n')[0]
-                    subprocess.run(["open", found_path], check=True)
-                    return {"action": "open_folder", "status": "success", "path": found_path}
-                else:
+                if found_path is None:
                     return {"action": "open_folder", "status": "not_found", "target": target}
+                
+                self._folder_cache[target] = (time.monotonic(), found_path)
+                await self.run_open(found_path, check=True)
+                return {"action": "open_folder", "status": "success", "path": found_path}
             
             return {"action": "open", "status": "unknown_type", "type": action_type}
             
@@ -323,38 +753,17 @@ RESPONSE: I understand this is a complex command with multiple steps. I'm doing
         search_type = action.get("type", "files")
         
         try:
-            found_items = []
-            
             # Handle multiple patterns (comma-separated)
             patterns = [p.strip() for p in pattern.split(",")]
             
-            for p in patterns:
-                try:
-                    if search_type == "files":
-                        # Search for files matching pattern
-                        search_result = subprocess.run(
-                            ["find", search_path, "-type", "f", "-name", p, "-maxdepth", "4"],
-                            capture_output=True, text=True, timeout=10
-                        )
-                    else:
-                        # Search for directories
-                        search_result = subprocess.run(
-                            ["find", search_path, "-type", "d", "-name", p, "-maxdepth", "4"], 
-                            capture_output=True, text=True, timeout=10
-                        )
-                    
-                    if search_result.stdout.strip():
-                        found_items.extend(search_result.stdout.strip().split('\n'))
-                        
-                except subprocess.TimeoutExpired:
-                    logging.warning(f"Search timeout for pattern {p} in {search_path}")
-                    continue
-                except Exception as e:
-                    logging.warning(f"Search error for pattern {p}: {e}")
-                    continue
-            
-            # Remove duplicates and empty entries
-            found_items = list(set([item for item in found_items if item.strip()]))
+            # One in-process walk matches every pattern per directory entry
+            async with _semaphore("find"):
+                found_items, timed_out = await asyncio.get_running_loop().run_in_executor(
+                    None, walk_matching, search_path, patterns, search_type != "files",
+                    SEARCH_MAX_DEPTH, SEARCH_MAX_RESULTS, SEARCH_TIMEOUT
+                )
+            if timed_out:
+                logging.warning(f"Search timeout for patterns {patterns} in {search_path}")
             
             if found_items:
                 # For email files, try to open the containing folders
@@ -365,17 +774,20 @@ RESPONSE: I understand this is a complex command with multiple steps. I'm doing
                         folders_to_open.add(folder)
                     
                     # Open the folders containing emails
-                    for folder in list(folders_to_open)[:3]:  # Limit to 3 folders
-                        subprocess.run(["open", folder], check=False)
+                    await asyncio.gather(*(self.run_open(folder) for folder in list(folders_to_open)[:3]))  # Limit to 3 folders
                 
                 return {
                     "action": "search", 
                     "status": "success", 
                     "found_count": len(found_items),
+                    # The walk stops at SEARCH_MAX_RESULTS matches or SEARCH_TIMEOUT, so the count is a lower bound
+                    "truncated": timed_out or len(found_items) >= SEARCH_MAX_RESULTS,
                     "items": found_items[:10],  # Return first 10 items
                     "search_path": search_path,
                     "pattern": pattern
                 }
+            elif timed_out:
+                return {"action": "search", "status": "timeout", "error": "Search took too long"}
             else:
                 return {
                     "action": "search",
@@ -384,8 +796,6 @@ RESPONSE: I understand this is a complex command with multiple steps. I'm doing
                     "pattern": pattern
                 }
                 
-        except subprocess.TimeoutExpired:
-            return {"action": "search", "status": "timeout", "error": "Search took too long"}
         except Exception as e:
             return {"action": "search", "status": "error", "error": str(e)}
     
@@ -413,7 +823,7 @@ RESPONSE: I understand this is a complex command with multiple steps. I'm doing
         }
         
         try:
-            requests.post(f"{self.service_endpoints['memory']}/store", json=interaction_data)
+            await self._enqueue_store(interaction_data)
         except Exception as e:
             logging.error(f"Failed to store interaction: {e}")
 
@@ -422,27 +832,28 @@ RESPONSE: I understand this is a complex command with multiple steps. I'm doing
 async def process_conversational_voice_command(trigger_data: Dict[str, Any]) -> Dict[str, Any]:
     """Main function called by workflow orchestrator"""
     
-    processor = ConversationalVoiceProcessor()
     command_text = trigger_data.get("command", "")
     
     if not command_text:
         return {"status": "error", "message": "No command text provided"}
     
+    processor = ConversationalVoiceProcessor()
     try:
         result = await processor.process_voice_command(command_text, trigger_data)
         return {"status": "success", "result": result}
     except Exception as e:
         logging.error(f"Conversational voice processing failed: {e}")
         return {"status": "error", "message": str(e)}
+    finally:
+        await processor.aclose()
 
 
 if __name__ == "__main__":
     # Test the processor
-    import asyncio
-    
     async def test():
         processor = ConversationalVoiceProcessor()
         result = await processor.process_voice_command("take a screenshot")
         print(json.dumps(result, indent=2))
+        await processor.aclose()
     
     asyncio.run(test())
@@ -4,11 +4,14 @@ Conversational Voice Service
 HTTP service that processes voice commands through Claude AI simulation
 """
 
-import asyncio
-import json
 import logging
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from contextlib import asynccontextmanager
+from typing import Dict, Any
+import uvicorn
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
 import sys
 import os
 
@@ -21,52 +24,69 @@ from conversational_voice import ConversationalVoiceProcessor
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
+# Created on startup so its HTTP connection pool lives on the server's event loop
+processor: ConversationalVoiceProcessor = None
 
-# Initialize the conversational processor
-processor = ConversationalVoiceProcessor()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the conversational processor and close its HTTP client on shutdown"""
+    global processor
+    processor = ConversationalVoiceProcessor()
+    try:
+        yield
+    finally:
+        await processor.aclose()
+
+app = FastAPI(title="Conversational Voice Service", version="1.0.0", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
-@app.route('/health', methods=['GET'])
-def health():
-    return jsonify({
+class CommandIn(BaseModel):
+    command: str = ""
+    context: Dict[str, Any] = {}
+
+@app.get('/health')
+async def health():
+    return {
         "status": "healthy",
         "service": "conversational_voice",
         "port": 8087,
         "capabilities": ["voice_processing", "claude_integration", "action_execution"]
-    })
+    }
 
-@app.route('/process_command', methods=['POST'])
-async def process_command():
+@app.post('/process_command')
+async def process_command(body: CommandIn):
     """Main endpoint for processing voice commands"""
     try:
-        data = request.get_json()
-        command = data.get('command', '')
-        context = data.get('context', {})
-        
+        command = body.command
+
         if not command:
-            return jsonify({"error": "No command provided"}), 400
-        
+            return JSONResponse({"error": "No command provided"}, status_code=400)
+
         logger.info(f"Processing voice command: '{command}'")
-        
+
         # Process the command through Claude
-        result = await processor.process_voice_command(command, context)
-        
-        return jsonify({
+        result = await processor.process_voice_command(command, body.context)
+
+        return {
             "status": "success",
             "result": result
-        })
-        
+        }
+
     except Exception as e:
         logger.error(f"Error processing command: {e}")
-        return jsonify({
-            "status": "error", 
+        return JSONResponse({
+            "status": "error",
             "message": str(e)
-        }), 500
+        }, status_code=500)
 
-@app.route('/info', methods=['GET'])
-def info():
-    return jsonify({
+@app.get('/info')
+async def info():
+    return {
         "service": "conversational_voice",
         "version": "1.0.0",
         "description": "Conversational voice command processor with Claude AI integration",
@@ -75,23 +95,8 @@ def info():
             "/process_command - Process voice commands",
             "/info - Service information"
         ]
-    })
-
-# Async wrapper for Flask
-def run_async_endpoint(func):
-    """Wrapper to run async functions in Flask"""
-    def wrapper(*args, **kwargs):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(func(*args, **kwargs))
-        finally:
-            loop.close()
-    return wrapper
-
-# Apply async wrapper
-app.view_functions['process_command'] = run_async_endpoint(app.view_functions['process_command'])
+    }
 
 if __name__ == '__main__':
     logger.info("Starting Conversational Voice Service on port 8087")
-    app.run(host='0.0.0.0', port=8087, debug=False)
+    uvicorn.run(app, host='0.0.0.0', port=8087, log_level="info")
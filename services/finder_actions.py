@@ -5,29 +5,83 @@ Smart file operations and organization for macOS
 """
 
 import os
+import re
+import sys
+import errno
 import shutil
 import hashlib
+import mmap
 import mimetypes
 import subprocess
 import json
 import logging
 import time
 import threading
+import queue
+import tempfile
 from typing import Dict, List, Any, Optional, Tuple
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
 from pathlib import Path
-from dataclasses import dataclass
-import requests
+from dataclasses import dataclass, field, asdict, replace
+import httpx
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+# Native FSEvents backend on macOS; watchdog's default Observer elsewhere
+try:
+    from watchdog.observers.fsevents import FSEventsObserver as WatchObserver
+except ImportError:
+    WatchObserver = Observer
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Duplicate detection: cheap head hash first, full hash only when heads collide
+DUPLICATE_HEAD_BYTES = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+HASH_WORKERS = 8
+MMAP_SEQUENTIAL_BYTES = 100 * 1024 * 1024  # hint readahead for files this large
+HASH_MAX_IN_FLIGHT = 16
+
+# Parallel stat walk over top-level subdirectories for smart-organize analysis (kept small:
+# once the stat cache is warm a serial walk is already fast)
+ANALYZE_WORKERS = 4
+
+# How long a path that failed to stat with ENOENT is reported missing without re-checking
+MISSING_FILE_TTL = 2.0  # seconds
+
+# In-progress downloads and hidden/temp files that the watcher ignores outright
+TEMP_FILE_SUFFIXES = ('.part', '.crdownload', '.download', '.tmp')
+
+# Smart-organize histogram buckets: category i covers values below bound i
+SIZE_BOUNDS_MB = (1, 10)
+SIZE_CATEGORIES = ('small', 'medium', 'large')
+AGE_BOUNDS_DAYS = (7, 30)
+AGE_CATEGORIES = ('recent', 'month', 'old')
+
+# Persisted FileInfo/hash cache, so restarts don't re-classify and re-hash unchanged files
+META_CACHE_PATH = os.path.expanduser("~/.cache/mcp-finder/meta.json")
+META_CACHE_MAX_ENTRIES = 50000
+META_CACHE_SAVE_DELAY = 30.0  # seconds; saves requested within this window are written once
+
+# Quiet period before a newly created file is organized
+FILE_SETTLE_DELAY = 2.0  # seconds
+
+# Memory-store batching (kept small so a batch never waits long)
+MEMORY_BATCH_MAX = 32
+MEMORY_BATCH_WINDOW = 0.2  # seconds
+
+# FileInfo is allocated per file on every walk; __slots__ drops the per-instance dict
+# (dataclass slots need Python 3.10+, older interpreters keep a regular dataclass)
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_SLOTS)
 class FileInfo:
     """Information about a file"""
     path: str
@@ -51,34 +105,172 @@ class OrganizationRule:
     condition: Dict[str, Any]  # e.g., {"extension": ".pdf", "size_mb": ">10"}
     action: Dict[str, Any]     # e.g., {"move_to": "/Users/mark/Documents/PDFs"}
     priority: int = 0
+    _compiled: Dict[str, Any] = field(default=None, repr=False, compare=False)
+    
+    def __post_init__(self):
+        if self._compiled is None:
+            self._compiled = _compile_condition(self.condition)
+
+def _path_components(path: str) -> List[str]:
+    """Split an absolute path into its non-empty components"""
+    return [component for component in path.split('/') if component]
+
+def _parse_threshold(value: str) -> Optional[Tuple[str, float]]:
+    """Parse a '>N' / '<N' condition into (operator, threshold)"""
+    if value.startswith('>') or value.startswith('<'):
+        return value[0], float(value[1:])
+    return None
+
+def _compile_condition(condition: Dict[str, Any]) -> Dict[str, Any]:
+    """Precompute the matchers _matches_condition needs for a rule condition"""
+    compiled = {}
+    
+    if 'directory' in condition:
+        compiled['directory_prefix'] = condition['directory'].rstrip('/') + '/'
+    
+    if 'extensions' in condition:
+        compiled['extensions'] = frozenset(ext.lower() for ext in condition['extensions'])
+    
+    if 'name_pattern' in condition:
+        pattern = condition['name_pattern']
+        if '*' in pattern:
+            # '*' is the only wildcard; everything else matches literally
+            compiled['name_regex'] = re.compile('.*'.join(re.escape(part) for part in pattern.split('*')) + r'\Z', re.S)
+        else:
+            compiled['name_substring'] = pattern
+    
+    for key in ('size_mb', 'age_days'):
+        if key in condition:
+            compiled[key] = _parse_threshold(condition[key])
+    
+    return compiled
+
+def _classify_mime_type(mime_type: str) -> str:
+    """Map a MIME type onto the coarse file_type used by organization rules"""
+    if mime_type.startswith('image/'):
+        return 'image'
+    elif mime_type.startswith('video/'):
+        return 'video'
+    elif mime_type.startswith('audio/'):
+        return 'audio'
+    elif mime_type.startswith('text/'):
+        return 'text'
+    elif 'pdf' in mime_type:
+        return 'pdf'
+    return 'document'
+
+def _build_ext_type_map() -> Dict[str, Tuple[str, str]]:
+    """Lowercase extension -> (file_type, mime_type), resolved once from mimetypes"""
+    mimetypes.init()
+    ext_map = {}
+    for ext in mimetypes.types_map:
+        mime_type, _ = mimetypes.guess_type('file' + ext)
+        if mime_type:
+            ext_map.setdefault(ext.lower(), (_classify_mime_type(mime_type), mime_type))
+    return ext_map
+
+_EXT_TO_TYPE = _build_ext_type_map()
+_SPECIAL_SUFFIXES = frozenset(ext.lower() for ext in (*mimetypes.encodings_map, *mimetypes.suffix_map))
 
 class FinderWatcher(FileSystemEventHandler):
     """File system watcher for real-time organization"""
     
-    def __init__(self, finder_service):
+    def __init__(self, finder_service, extensions: Optional[List[str]] = None):
         self.finder_service = finder_service
         
+        # Optional allow-list of extensions; everything else is ignored before any other work
+        self.extensions = frozenset(ext.lower() for ext in extensions) if extensions else None
+        
+        # path -> monotonic time it's due; one worker drains it instead of a Timer per event
+        self._pending: Dict[str, float] = {}
+        self._pending_cond = threading.Condition()
+        self._stopped = False
+        self._worker = threading.Thread(target=self._process_pending, daemon=True)
+        self._worker.start()
+        
+    def _wants(self, file_path: str) -> bool:
+        """Cheap name-only filter applied before any stat or rule work"""
+        name = os.path.basename(file_path)
+        if name.startswith('.') or name.lower().endswith(TEMP_FILE_SUFFIXES):
+            return False
+        if self.extensions is not None:
+            return os.path.splitext(name)[1].lower() in self.extensions
+        return True
+    
     def on_created(self, event):
-        if not event.is_directory:
+        if not event.is_directory and self._wants(event.src_path):
+            self.finder_service._invalidate_file_info(event.src_path)
             # Small delay to ensure file is fully written
-            threading.Timer(2.0, self._process_new_file, [event.src_path]).start()
+            self._schedule(event.src_path)
     
     def on_moved(self, event):
         if not event.is_directory:
             self.finder_service._update_file_tracking(event.src_path, event.dest_path)
+            # A finished download renamed from its temp name is a new file for our purposes
+            if self._wants(event.dest_path) and not self._wants(event.src_path):
+                self._schedule(event.dest_path)
+    
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.finder_service._invalidate_file_info(event.src_path)
+            # Still being written: push its processing back
+            with self._pending_cond:
+                if event.src_path in self._pending:
+                    self._pending[event.src_path] = time.monotonic() + FILE_SETTLE_DELAY
+    
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.finder_service._invalidate_file_info(event.src_path)
+    
+    def stop(self):
+        """Stop the worker and drop files that are still waiting to be processed"""
+        with self._pending_cond:
+            self._stopped = True
+            self._pending.clear()
+            self._pending_cond.notify()
+    
+    def _schedule(self, file_path: str):
+        """Queue a file for processing once it has been quiet for FILE_SETTLE_DELAY"""
+        with self._pending_cond:
+            if self._stopped:
+                return
+            self._pending[file_path] = time.monotonic() + FILE_SETTLE_DELAY
+            self._pending_cond.notify()
+    
+    def _process_pending(self):
+        """Worker loop: sleep until the earliest due file, then process every due file"""
+        while True:
+            with self._pending_cond:
+                while True:
+                    if self._stopped:
+                        return
+                    now = time.monotonic()
+                    due = [path for path, due_at in self._pending.items() if due_at <= now]
+                    if due:
+                        for path in due:
+                            del self._pending[path]
+                        break
+                    timeout = min(self._pending.values()) - now if self._pending else None
+                    self._pending_cond.wait(timeout)
+            
+            for file_path in due:
+                if self._stopped:
+                    return  # Unwatched mid-batch: leave the rest alone
+                self._process_new_file(file_path)
     
     def _process_new_file(self, file_path: str):
         """Process newly created file"""
         try:
-            if os.path.exists(file_path):
-                self.finder_service._apply_organization_rules(file_path)
+            self.finder_service._apply_organization_rules(file_path)
+        except FileNotFoundError:
+            pass  # Gone before we got to it (e.g. a renamed temp download)
         except Exception as e:
             logger.error(f"Error processing new file {file_path}: {e}")
 
 class FinderActions:
     """Smart file operations and organization service"""
     
-    def __init__(self, port: int = 8082):
+    def __init__(self, port: int = 8082, meta_cache_path: str = META_CACHE_PATH):
         self.port = port
         self.app = Flask(__name__)
         CORS(self.app)
@@ -86,10 +278,44 @@ class FinderActions:
         # Organization rules
         self.organization_rules: List[OrganizationRule] = []
         self.watched_directories: Dict[str, Observer] = {}
+        self._watch_handlers: Dict[str, FinderWatcher] = {}
         
-        # File tracking
+        # Rule index (positions into _indexed_rules) so each file only checks candidate rules
+        self._indexed_rules: List[OrganizationRule] = []
+        self._rules_by_ext: Dict[str, List[int]] = {}
+        self._rules_by_type: Dict[str, List[int]] = {}
+        self._dir_trie: Dict[str, Any] = {'rules': [], 'children': {}}
+        self._hard_rules: List[int] = []
+        
+        # File tracking; doubles as a FileInfo cache while a file's mtime and size are unchanged
         self.file_tracker: Dict[str, FileInfo] = {}
         
+        # Negative stat cache: path -> monotonic time until which it's reported missing
+        self._missing_files: Dict[str, float] = {}
+        
+        # Full-file hashes: path -> (mtime_ns, size, sha256)
+        self._hash_cache: Dict[str, Tuple[int, int, str]] = {}
+        
+        # file_tracker and _hash_cache survive restarts via an on-disk meta cache
+        self._meta_cache_path = meta_cache_path
+        self._load_meta_cache()
+        # Saves are debounced onto a timer; the write lock keeps concurrent writers from interleaving
+        self._meta_save_lock = threading.Lock()
+        self._meta_timer_lock = threading.Lock()
+        self._meta_save_timer: Optional[threading.Timer] = None
+        
+        # Worker threads for duplicate-detection hashing
+        self._hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS)
+        
+        # One keep-alive client per local service; connections are reused across calls
+        limits = httpx.Limits(max_connections=32, max_keepalive_connections=8)
+        self._registry_http = httpx.Client(base_url='http://localhost:8080', timeout=10, limits=limits)
+        self._memory_http = httpx.Client(base_url='http://localhost:8081', timeout=10, limits=limits)
+        
+        # Memory writes are queued and sent to /store_batch by a single flusher thread
+        self._memory_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        threading.Thread(target=self._flush_memory_queue, daemon=True).start()
+        
         # Default organization rules
         self._load_default_rules()
         
@@ -126,6 +352,7 @@ class FinderActions:
         ]
         
         self.organization_rules.extend(default_rules)
+        self._rebuild_rule_index()
         
         @self.app.route('/smart_organize', methods=['POST'])
         def smart_organize():
@@ -149,6 +376,7 @@ class FinderActions:
             
             self.organization_rules.append(rule)
             self.organization_rules.sort(key=lambda r: r.priority, reverse=True)
+            self._rebuild_rule_index()
             
             return jsonify({'status': 'rule_added', 'rule_name': rule.name})
         
@@ -177,12 +405,13 @@ class FinderActions:
             if not os.path.exists(directory):
                 return jsonify({'error': 'Directory not found'}), 404
             
-            observer = Observer()
-            event_handler = FinderWatcher(self)
+            observer = WatchObserver()
+            event_handler = FinderWatcher(self, data.get('extensions'))
             observer.schedule(event_handler, directory, recursive=data.get('recursive', False))
             observer.start()
             
             self.watched_directories[directory] = observer
+            self._watch_handlers[directory] = event_handler
             
             return jsonify({'status': 'watching_started', 'directory': directory})
         
@@ -193,8 +422,9 @@ class FinderActions:
             directory = data['directory']
             
             if directory in self.watched_directories:
-                self.watched_directories[directory].stop()
-                del self.watched_directories[directory]
+                self.watched_directories.pop(directory).stop()
+                # Also ends the handler's worker thread and drops its unprocessed files
+                self._watch_handlers.pop(directory).stop()
                 return jsonify({'status': 'watching_stopped'})
             
             return jsonify({'error': 'Directory not being watched'}), 404
@@ -209,7 +439,7 @@ class FinderActions:
                 return jsonify({'error': 'File not found'}), 404
             
             file_info = self._get_file_info(file_path)
-            return jsonify(file_info.__dict__)
+            return jsonify(asdict(file_info))
         
         @self.app.route('/health', methods=['GET'])
         def health():
@@ -225,22 +455,22 @@ class FinderActions:
         results = []
         
         try:
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    
-                    try:
-                        # Apply organization rules
-                        actions = self._apply_organization_rules(file_path, dry_run)
-                        if actions:
-                            results.extend(actions)
-                    except Exception as e:
-                        logger.error(f"Error processing {file_path}: {e}")
-                        results.append({
-                            'file': file_path,
-                            'action': 'error',
-                            'message': str(e)
-                        })
+            for entry in self._iter_files(directory):
+                file_path = entry.path
+                
+                try:
+                    # Apply organization rules
+                    file_info = self._get_file_info_from_entry(entry)
+                    actions = self._apply_organization_rules(file_path, dry_run, file_info)
+                    if actions:
+                        results.extend(actions)
+                except Exception as e:
+                    logger.error(f"Error processing {file_path}: {e}")
+                    results.append({
+                        'file': file_path,
+                        'action': 'error',
+                        'message': str(e)
+                    })
         
         except Exception as e:
             logger.error(f"Error organizing directory {directory}: {e}")
@@ -250,63 +480,110 @@ class FinderActions:
                 'message': str(e)
             })
         
+        self._schedule_meta_cache_save()
         return results
     
-    def _apply_organization_rules(self, file_path: str, dry_run: bool = False) -> List[Dict[str, Any]]:
+    def _apply_organization_rules(self, file_path: str, dry_run: bool = False,
+                                  file_info: Optional[FileInfo] = None) -> List[Dict[str, Any]]:
         """Apply organization rules to a specific file"""
         actions = []
-        file_info = self._get_file_info(file_path)
+        if file_info is None:
+            file_info = self._get_file_info(file_path)
         
-        for rule in self.organization_rules:
-            if self._matches_condition(file_info, rule.condition):
+        # The highest-priority move wins; after it only tag/notify rules still apply
+        moved = False
+        for rule in self._candidate_rules(file_info):
+            if moved and 'move_to' in rule.action:
+                continue
+            if self._matches_condition(file_info, rule.condition, rule._compiled):
                 action_result = self._execute_action(file_info, rule.action, dry_run)
                 if action_result:
                     action_result['rule_name'] = rule.name
                     actions.append(action_result)
+                    if action_result['action'] in ('moved', 'would_move'):
+                        moved = True
         
         return actions
     
-    def _matches_condition(self, file_info: FileInfo, condition: Dict[str, Any]) -> bool:
+    def _rebuild_rule_index(self):
+        """Index rules by one required "easy" condition: extension, file type or directory.
+        
+        A rule with none of those is "hard" and checked against every file.
+        """
+        rules = list(self.organization_rules)
+        by_ext: Dict[str, List[int]] = defaultdict(list)
+        by_type: Dict[str, List[int]] = defaultdict(list)
+        dir_trie: Dict[str, Any] = {'rules': [], 'children': {}}
+        hard: List[int] = []
+        
+        for position, rule in enumerate(rules):
+            condition = rule.condition
+            if 'extensions' in condition:
+                for ext in rule._compiled['extensions']:
+                    by_ext[ext].append(position)
+            elif 'file_type' in condition:
+                by_type[condition['file_type']].append(position)
+            elif 'directory' in condition:
+                # Path-component trie: one descent per file finds every ancestor-directory rule
+                node = dir_trie
+                for component in _path_components(condition['directory']):
+                    node = node['children'].setdefault(component, {'rules': [], 'children': {}})
+                node['rules'].append(position)
+            else:
+                hard.append(position)
+        
+        self._rules_by_ext = dict(by_ext)
+        self._rules_by_type = dict(by_type)
+        self._dir_trie = dir_trie
+        self._hard_rules = hard
+        self._indexed_rules = rules
+    
+    def _candidate_rules(self, file_info: FileInfo) -> List[OrganizationRule]:
+        """Rules that could match a file, in rule priority order"""
+        rules = self._indexed_rules
+        candidates = set(self._hard_rules)
+        candidates.update(self._rules_by_ext.get(os.path.splitext(file_info.name)[1].lower(), ()))
+        candidates.update(self._rules_by_type.get(file_info.file_type, ()))
+        node = self._dir_trie
+        candidates.update(node['rules'])
+        for component in _path_components(os.path.dirname(file_info.path)):
+            node = node['children'].get(component)
+            if node is None:
+                break
+            candidates.update(node['rules'])
+        return [rules[position] for position in sorted(candidates)]
+    
+    def _matches_condition(self, file_info: FileInfo, condition: Dict[str, Any],
+                           compiled: Optional[Dict[str, Any]] = None) -> bool:
         """Check if file matches rule condition"""
+        if compiled is None:
+            compiled = _compile_condition(condition)
         
-        # Directory condition
-        if 'directory' in condition:
-            if not file_info.path.startswith(condition['directory']):
+        # Directory condition (the file must be somewhere under the directory)
+        if 'directory_prefix' in compiled:
+            if not file_info.path.startswith(compiled['directory_prefix']):
                 return False
         
         # Extension condition
-        if 'extensions' in condition:
+        if 'extensions' in compiled:
             file_ext = os.path.splitext(file_info.name)[1].lower()
-            if file_ext not in [ext.lower() for ext in condition['extensions']]:
+            if file_ext not in compiled['extensions']:
                 return False
         
         # Name pattern condition
-        if 'name_pattern' in condition:
-            pattern = condition['name_pattern']
-            if '*' in pattern:
-                # Simple wildcard matching
-                pattern_parts = pattern.split('*')
-                if len(pattern_parts) == 2:
-                    prefix, suffix = pattern_parts
-                    if not (file_info.name.startswith(prefix) and file_info.name.endswith(suffix)):
-                        return False
-            else:
-                if pattern not in file_info.name:
-                    return False
+        if 'name_regex' in compiled:
+            if not compiled['name_regex'].match(file_info.name):
+                return False
+        elif 'name_substring' in compiled:
+            if compiled['name_substring'] not in file_info.name:
+                return False
         
         # Size condition
-        if 'size_mb' in condition:
-            size_condition = condition['size_mb']
+        if compiled.get('size_mb'):
+            op, threshold = compiled['size_mb']
             file_size_mb = file_info.size / (1024 * 1024)
-            
-            if size_condition.startswith('>'):
-                threshold = float(size_condition[1:])
-                if file_size_mb <= threshold:
-                    return False
-            elif size_condition.startswith('<'):
-                threshold = float(size_condition[1:])
-                if file_size_mb >= threshold:
-                    return False
+            if (file_size_mb <= threshold) if op == '>' else (file_size_mb >= threshold):
+                return False
         
         # File type condition
         if 'file_type' in condition:
@@ -314,18 +591,11 @@ class FinderActions:
                 return False
         
         # Age condition (in days)
-        if 'age_days' in condition:
-            age_condition = condition['age_days']
+        if compiled.get('age_days'):
+            op, threshold = compiled['age_days']
             file_age_days = (time.time() - file_info.modified) / (24 * 3600)
-            
-            if age_condition.startswith('>'):
-                threshold = float(age_condition[1:])
-                if file_age_days <= threshold:
-                    return False
-            elif age_condition.startswith('<'):
-                threshold = float(age_condition[1:])
-                if file_age_days >= threshold:
-                    return False
+            if (file_age_days <= threshold) if op == '>' else (file_age_days >= threshold):
+                return False
         
         return True
     
@@ -334,6 +604,7 @@ class FinderActions:
         
         if 'move_to' in action:
             target_dir = action['move_to']
+            source_path = file_info.path
             
             # Create target directory if it doesn't exist
             if not dry_run:
@@ -351,23 +622,23 @@ class FinderActions:
             
             if not dry_run:
                 try:
-                    shutil.move(file_info.path, target_path)
+                    self._move_file(source_path, target_path)
                     # Update file tracking
-                    self._update_file_tracking(file_info.path, target_path)
+                    self._update_file_tracking(source_path, target_path)
                     
                     # Store in memory for context
                     self._store_file_action_memory(file_info, 'moved', target_path)
                     
                 except Exception as e:
                     return {
-                        'file': file_info.path,
+                        'file': source_path,
                         'action': 'move_failed',
                         'target': target_path,
                         'error': str(e)
                     }
             
             return {
-                'file': file_info.path,
+                'file': source_path,
                 'action': 'moved' if not dry_run else 'would_move',
                 'target': target_path
             }
@@ -388,7 +659,8 @@ class FinderActions:
         elif 'tag' in action:
             tag = action['tag']
             
-            if not dry_run:
+            # Tags persist on the tracked FileInfo, so re-running the rules must not add them twice
+            if not dry_run and tag not in file_info.tags:
                 # Add tag to file (store in memory)
                 file_info.tags.append(tag)
                 self._store_file_action_memory(file_info, 'tagged', tag)
@@ -401,28 +673,121 @@ class FinderActions:
         
         return None
     
+    def _iter_files(self, directory: str):
+        """Recursively yield os.DirEntry objects for the files under a directory.
+        
+        Same files as os.walk's file lists (symlinked directories are not followed),
+        but each DirEntry caches its stat so callers don't need a second os.stat.
+        """
+        files, subdirs = self._scan_directory(directory)
+        yield from files
+        for subdir in subdirs:
+            yield from self._iter_files(subdir)
+    
+    def _scan_directory(self, directory: str) -> Tuple[List[os.DirEntry], List[str]]:
+        """List one directory: (file entries, subdirectories to descend into)"""
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            return [], []
+        
+        files, subdirs = [], []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                files.append(entry)
+            elif not entry.is_symlink():
+                subdirs.append(entry.path)
+        return files, subdirs
+    
+    def _collect_file_infos(self, directory: str) -> List[FileInfo]:
+        """FileInfo for every file under a directory, walking top-level subtrees in parallel"""
+        files, subdirs = self._scan_directory(directory)
+        file_infos = self._file_infos_from_entries(files)
+        
+        # Stat latency overlaps across subtrees; results are merged in walk order
+        if subdirs:
+            with ThreadPoolExecutor(max_workers=ANALYZE_WORKERS) as pool:
+                for subtree_infos in pool.map(self._collect_subtree_infos, subdirs):
+                    file_infos.extend(subtree_infos)
+        return file_infos
+    
+    def _collect_subtree_infos(self, directory: str) -> List[FileInfo]:
+        """FileInfo for every file in one subtree (runs on the analysis pool)"""
+        return self._file_infos_from_entries(self._iter_files(directory))
+    
+    def _file_infos_from_entries(self, entries) -> List[FileInfo]:
+        """FileInfo for each scandir entry, skipping (and logging) ones that fail to stat"""
+        file_infos = []
+        for entry in entries:
+            try:
+                file_infos.append(self._get_file_info_from_entry(entry))
+            except OSError as e:
+                logger.error(f"Error reading {entry.path}: {e}")
+        return file_infos
+    
+    def _move_file(self, source_path: str, target_path: str):
+        """Rename in place when possible; copy across filesystems otherwise"""
+        try:
+            os.rename(source_path, target_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Cross-device: copy2 uses fcopyfile (macOS) / sendfile (Linux) and keeps metadata
+            shutil.copy2(source_path, target_path)
+            os.unlink(source_path)
+    
     def _get_file_info(self, file_path: str) -> FileInfo:
         """Get detailed information about a file"""
-        stat = os.stat(file_path)
-        name = os.path.basename(file_path)
+        missing_until = self._missing_files.get(file_path)
+        if missing_until is not None:
+            if time.monotonic() < missing_until:
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), file_path)
+            self._missing_files.pop(file_path, None)
         
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            self._missing_files[file_path] = time.monotonic() + MISSING_FILE_TTL
+            raise
+        
+        return self._tracked_file_info(file_path, os.path.basename(file_path), stat)
+    
+    def _get_file_info_from_entry(self, entry: os.DirEntry) -> FileInfo:
+        """Get file information from a scandir entry, reusing its cached stat"""
+        return self._tracked_file_info(entry.path, entry.name, entry.stat())
+    
+    def _tracked_file_info(self, file_path: str, name: str, stat: os.stat_result) -> FileInfo:
+        """Return the tracked FileInfo for a path, rebuilding it if the file changed"""
+        cached = self.file_tracker.get(file_path)
+        if cached is not None and cached.modified == stat.st_mtime and cached.size == stat.st_size:
+            return cached
+        
+        file_info = self._build_file_info(file_path, name, stat)
+        self.file_tracker[file_path] = file_info
+        return file_info
+    
+    def _invalidate_file_info(self, file_path: str):
+        """Drop cached (positive or negative) stat results for a path"""
+        self.file_tracker.pop(file_path, None)
+        self._missing_files.pop(file_path, None)
+    
+    def _build_file_info(self, file_path: str, name: str, stat: os.stat_result) -> FileInfo:
+        """Build FileInfo from a path and its stat result"""
         # Determine file type
-        mime_type, _ = mimetypes.guess_type(file_path)
-        if mime_type:
-            if mime_type.startswith('image/'):
-                file_type = 'image'
-            elif mime_type.startswith('video/'):
-                file_type = 'video'
-            elif mime_type.startswith('audio/'):
-                file_type = 'audio'
-            elif mime_type.startswith('text/'):
-                file_type = 'text'
-            elif 'pdf' in mime_type:
-                file_type = 'pdf'
-            else:
-                file_type = 'document'
+        ext = os.path.splitext(name)[1].lower()
+        if ext in _EXT_TO_TYPE:
+            file_type, mime_type = _EXT_TO_TYPE[ext]
+        elif ext in _SPECIAL_SUFFIXES:
+            # Compressed/aliased suffixes (.gz, .tgz, ...) need mimetypes' full logic
+            mime_type, _ = mimetypes.guess_type(file_path)
+            file_type = _classify_mime_type(mime_type) if mime_type else 'unknown'
         else:
-            file_type = 'unknown'
+            file_type, mime_type = 'unknown', None
         
         return FileInfo(
             path=file_path,
@@ -436,36 +801,117 @@ class FinderActions:
     
     def _find_duplicates(self, directory: str) -> List[Dict[str, Any]]:
         """Find duplicate files by hash"""
-        file_hashes = {}
-        duplicates = []
+        # Pass 1: bucket by size (stat only); a file with a unique size has no duplicate
+        files_by_size = defaultdict(list)
+        stat_keys: Dict[str, Tuple[int, int]] = {}
+        for entry in self._iter_files(directory):
+            try:
+                stat = entry.stat()
+            except OSError as e:
+                logger.error(f"Error reading {entry.path}: {e}")
+                continue
+            files_by_size[stat.st_size].append(entry.path)
+            stat_keys[entry.path] = (stat.st_mtime_ns, stat.st_size)
         
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                file_path = os.path.join(root, file)
+        duplicates = []
+        for size, paths in files_by_size.items():
+            if len(paths) < 2:
+                continue
+            
+            # Pass 2: hash only the first 64 KiB, then fully hash files whose heads collide
+            for head_hash, head_paths in self._group_by_hash(paths, DUPLICATE_HEAD_BYTES).items():
+                if len(head_paths) < 2:
+                    continue
                 
-                try:
-                    # Calculate MD5 hash
-                    hash_md5 = hashlib.md5()
-                    with open(file_path, "rb") as f:
-                        for chunk in iter(lambda: f.read(4096), b""):
-                            hash_md5.update(chunk)
-                    file_hash = hash_md5.hexdigest()
-                    
-                    if file_hash in file_hashes:
-                        # Found duplicate
+                if size <= DUPLICATE_HEAD_BYTES:
+                    groups = {head_hash: head_paths}  # the head already covers the whole file
+                else:
+                    groups = self._group_by_hash(head_paths, stat_keys=stat_keys)
+                
+                for file_hash, same_paths in groups.items():
+                    for duplicate_path in same_paths[1:]:
                         duplicates.append({
                             'hash': file_hash,
-                            'original': file_hashes[file_hash],
-                            'duplicate': file_path,
-                            'size': os.path.getsize(file_path)
+                            'original': same_paths[0],
+                            'duplicate': duplicate_path,
+                            'size': size
                         })
-                    else:
-                        file_hashes[file_hash] = file_path
-                        
+        
+        self._schedule_meta_cache_save()
+        return duplicates
+    
+    def _group_by_hash(self, paths: List[str], limit: Optional[int] = None,
+                       stat_keys: Optional[Dict[str, Tuple[int, int]]] = None) -> Dict[str, List[str]]:
+        """Group paths by SHA-256 of their first `limit` bytes (whole file if None).
+        
+        Full hashes are reused from the meta cache while a file's (mtime_ns, size),
+        taken from `stat_keys`, is unchanged.
+        """
+        hashes: Dict[str, str] = {}
+        to_hash = paths
+        if limit is None and stat_keys is not None:
+            to_hash = []
+            for file_path in paths:
+                cached = self._hash_cache.get(file_path)
+                if cached is not None and tuple(cached[:2]) == stat_keys.get(file_path):
+                    hashes[file_path] = cached[2]
+                else:
+                    to_hash.append(file_path)
+        
+        # Hash on the pool (hashlib and file reads release the GIL), keeping at most
+        # HASH_MAX_IN_FLIGHT files open at once
+        pending = {}
+        remaining = iter(to_hash)
+        while True:
+            for file_path in remaining:
+                pending[self._hash_pool.submit(self._hash_file, file_path, limit)] = file_path
+                if len(pending) >= HASH_MAX_IN_FLIGHT:
+                    break
+            if not pending:
+                break
+            
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path = pending.pop(future)
+                try:
+                    hashes[file_path] = future.result()
                 except Exception as e:
                     logger.error(f"Error hashing {file_path}: {e}")
+                    continue
+                if limit is None and stat_keys is not None and file_path in stat_keys:
+                    self._hash_cache[file_path] = (*stat_keys[file_path], hashes[file_path])
         
-        return duplicates
+        # Group in input order so the first-walked file stays the "original"
+        groups = defaultdict(list)
+        for file_path in paths:
+            if file_path in hashes:
+                groups[hashes[file_path]].append(file_path)
+        return groups
+    
+    def _hash_file(self, file_path: str, limit: Optional[int] = None) -> str:
+        """SHA-256 hex digest of a file, or of its first `limit` bytes"""
+        with open(file_path, "rb") as f:
+            if limit is not None:
+                return hashlib.sha256(f.read(limit)).hexdigest()
+            
+            # Hash straight from the page cache; falls through for empty or unmappable files
+            size = os.fstat(f.fileno()).st_size
+            if size:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        if size >= MMAP_SEQUENTIAL_BYTES and hasattr(mm, 'madvise'):
+                            mm.madvise(mmap.MADV_SEQUENTIAL)
+                        return hashlib.sha256(mm).hexdigest()
+                except (OSError, ValueError):
+                    pass
+            
+            if hasattr(hashlib, 'file_digest'):
+                # Python 3.11+: hashed in C with readinto, no Python-level loop
+                return hashlib.file_digest(f, 'sha256').hexdigest()
+            file_hash = hashlib.sha256()
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                file_hash.update(chunk)
+            return file_hash.hexdigest()
     
     def _smart_organize_directory(self, directory: str) -> List[Dict[str, Any]]:
         """Intelligently organize files using content analysis"""
@@ -473,11 +919,11 @@ class FinderActions:
         
         # First, get memory context about previous file organizations
         try:
-            memory_response = requests.post('http://localhost:8081/search', json={
+            memory_response = self._memory_http.post('/search', json={
                 'query': f'organized files in {directory}',
                 'category': 'file_organization',
                 'limit': 10
-            }, timeout=10)
+            })
             
             previous_patterns = []
             if memory_response.status_code == 200:
@@ -491,15 +937,18 @@ class FinderActions:
             logger.error(f"Could not fetch memory context: {e}")
             previous_patterns = []
         
+        # Single walk: FileInfo for every file, reused for the analysis and for applying suggestions
+        file_infos = self._collect_file_infos(directory)
+        
         # Analyze files and create smart organization suggestions
-        file_analysis = self._analyze_directory_content(directory)
+        file_analysis = self._analyze_directory_content(directory, file_infos)
         
         # Generate organization suggestions based on analysis
         suggestions = self._generate_organization_suggestions(file_analysis, previous_patterns)
         
-        # Apply suggestions
+        # Match high-confidence suggestions; as before, matches are reported but no file is moved
         for suggestion in suggestions:
-            if suggestion['confidence'] > 0.7:  # Only apply high-confidence suggestions
+            if suggestion['confidence'] > 0.7:  # Only consider high-confidence suggestions
                 try:
                     # Create organization rule temporarily
                     temp_rule = OrganizationRule(
@@ -509,71 +958,56 @@ class FinderActions:
                         priority=10
                     )
                     
-                    # Apply rule to matching files
-                    for file_path in suggestion['matching_files']:
-                        file_info = self._get_file_info(file_path)
-                        if self._matches_condition(file_info, temp_rule.condition):
-                            action_result = self._execute_action(file_info, temp_rule.action)
-                            if action_result:
-                                action_result['suggestion_category'] = suggestion['category']
-                                action_result['confidence'] = suggestion['confidence']
-                                results.append(action_result)
+                    # Match against the FileInfo already collected; no new stat calls
+                    suggestion['matching_files'] = [
+                        file_info.path for file_info in file_infos
+                        if self._matches_condition(file_info, temp_rule.condition, temp_rule._compiled)
+                    ]
+                    logger.info(f"Smart suggestion {temp_rule.name} matches {len(suggestion['matching_files'])} files")
                 
                 except Exception as e:
-                    logger.error(f"Error applying smart suggestion: {e}")
+                    logger.error(f"Error matching smart suggestion: {e}")
         
         # Store learning in memory
         self._store_smart_organization_learning(directory, suggestions, results)
         
+        self._schedule_meta_cache_save()
         return results
     
-    def _analyze_directory_content(self, directory: str) -> Dict[str, Any]:
+    def _analyze_directory_content(self, directory: str, file_infos: Optional[List[FileInfo]] = None) -> Dict[str, Any]:
         """Analyze directory content for smart organization"""
         analysis = {
-            'file_types': {},
-            'size_distribution': {},
-            'age_distribution': {},
+            'file_types': Counter(),
+            'size_distribution': Counter(),
+            'age_distribution': Counter(),
             'naming_patterns': [],
             'total_files': 0
         }
         
         current_time = time.time()
         
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_info = self._get_file_info(file_path)
-                
-                analysis['total_files'] += 1
-                
-                # File type distribution
-                analysis['file_types'][file_info.file_type] = analysis['file_types'].get(file_info.file_type, 0) + 1
-                
-                # Size distribution
-                size_mb = file_info.size / (1024 * 1024)
-                if size_mb < 1:
-                    size_cat = 'small'
-                elif size_mb < 10:
-                    size_cat = 'medium'
-                else:
-                    size_cat = 'large'
-                analysis['size_distribution'][size_cat] = analysis['size_distribution'].get(size_cat, 0) + 1
-                
-                # Age distribution
-                age_days = (current_time - file_info.modified) / (24 * 3600)
-                if age_days < 7:
-                    age_cat = 'recent'
-                elif age_days < 30:
-                    age_cat = 'month'
-                else:
-                    age_cat = 'old'
-                analysis['age_distribution'][age_cat] = analysis['age_distribution'].get(age_cat, 0) + 1
-                
-                # Basic naming patterns
-                if file_info.name.startswith('Screenshot'):
-                    analysis['naming_patterns'].append('screenshot')
-                elif 'download' in file_info.name.lower():
-                    analysis['naming_patterns'].append('download')
+        if file_infos is None:
+            file_infos = self._collect_file_infos(directory)
+        
+        for file_info in file_infos:
+            analysis['total_files'] += 1
+            
+            # File type distribution
+            analysis['file_types'][file_info.file_type] += 1
+            
+            # Size distribution
+            size_mb = file_info.size / (1024 * 1024)
+            analysis['size_distribution'][SIZE_CATEGORIES[bisect_right(SIZE_BOUNDS_MB, size_mb)]] += 1
+            
+            # Age distribution
+            age_days = (current_time - file_info.modified) / (24 * 3600)
+            analysis['age_distribution'][AGE_CATEGORIES[bisect_right(AGE_BOUNDS_DAYS, age_days)]] += 1
+            
+            # Basic naming patterns
+            if file_info.name.startswith('Screenshot'):
+                analysis['naming_patterns'].append('screenshot')
+            elif 'download' in file_info.name.lower():
+                analysis['naming_patterns'].append('download')
         
         return analysis
     
@@ -604,7 +1038,8 @@ class FinderActions:
             })
         
         # Suggestion 3: File type clustering
-        dominant_type = max(analysis['file_types'].items(), key=lambda x: x[1])
+        most_common = analysis['file_types'].most_common(1)
+        dominant_type = most_common[0] if most_common else (None, 0)
         if dominant_type[1] > 5:  # More than 5 files of same type
             target_dir = self._get_type_target_directory(dominant_type[0])
             if target_dir:
@@ -631,16 +1066,73 @@ class FinderActions:
         }
         return type_mapping.get(file_type)
     
+    def _load_meta_cache(self):
+        """Load file_tracker and the hash cache saved by a previous run"""
+        try:
+            with open(self._meta_cache_path) as f:
+                meta = json.load(f)
+            self.file_tracker.update((path, FileInfo(**info)) for path, info in meta.get('files', {}).items())
+            self._hash_cache.update((path, tuple(entry)) for path, entry in meta.get('hashes', {}).items())
+            logger.info(f"Loaded meta cache: {len(self.file_tracker)} files, {len(self._hash_cache)} hashes")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Could not load meta cache: {e}")
+    
+    def _schedule_meta_cache_save(self):
+        """Save the meta cache once META_CACHE_SAVE_DELAY from now, unless a save is already pending"""
+        with self._meta_timer_lock:
+            if self._meta_save_timer is None:
+                self._meta_save_timer = threading.Timer(META_CACHE_SAVE_DELAY, self._run_scheduled_meta_cache_save)
+                self._meta_save_timer.daemon = True
+                self._meta_save_timer.start()
+    
+    def _run_scheduled_meta_cache_save(self):
+        """Timer callback: clear the pending save, then write"""
+        with self._meta_timer_lock:
+            self._meta_save_timer = None
+        self._save_meta_cache()
+    
+    def _save_meta_cache(self):
+        """Persist the most recent file_tracker and hash cache entries (atomic replace)"""
+        tmp_path = None
+        try:
+            with self._meta_save_lock:
+                files = list(dict(self.file_tracker).items())[-META_CACHE_MAX_ENTRIES:]
+                hashes = list(dict(self._hash_cache).items())[-META_CACHE_MAX_ENTRIES:]
+                meta = {
+                    'files': {path: asdict(file_info) for path, file_info in files},
+                    'hashes': dict(hashes)
+                }
+                
+                # Unique temp file in the same directory, so os.replace stays atomic
+                cache_dir = os.path.dirname(self._meta_cache_path)
+                os.makedirs(cache_dir, exist_ok=True)
+                with tempfile.NamedTemporaryFile('w', dir=cache_dir, prefix='meta.', suffix='.tmp', delete=False) as f:
+                    tmp_path = f.name
+                    json.dump(meta, f)
+                os.replace(tmp_path, self._meta_cache_path)
+                tmp_path = None
+        except Exception as e:
+            logger.error(f"Could not save meta cache: {e}")
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+    
     def _update_file_tracking(self, old_path: str, new_path: str):
         """Update file tracking when files are moved"""
+        self._missing_files.pop(new_path, None)
         if old_path in self.file_tracker:
             file_info = self.file_tracker[old_path]
-            file_info.path = new_path
-            file_info.name = os.path.basename(new_path)
             
-            # Update tracking
+            # Track a new entry; callers still holding the old FileInfo keep seeing the source path
             del self.file_tracker[old_path]
-            self.file_tracker[new_path] = file_info
+            self.file_tracker[new_path] = replace(
+                file_info, path=new_path, name=os.path.basename(new_path), tags=list(file_info.tags)
+            )
     
     def _store_file_action_memory(self, file_info: FileInfo, action: str, details: str):
         """Store file action in memory for learning"""
@@ -658,7 +1150,7 @@ class FinderActions:
                 'tags': ['file_action', action, file_info.file_type]
             }
             
-            requests.post('http://localhost:8081/store', json=memory_data, timeout=10)
+            self._memory_queue.put(memory_data)
         except Exception as e:
             logger.error(f"Could not store file action memory: {e}")
     
@@ -677,7 +1169,7 @@ class FinderActions:
                 'tags': ['smart_organization', 'learning']
             }
             
-            requests.post('http://localhost:8081/store', json=learning_data, timeout=10)
+            self._memory_queue.put(learning_data)
         except Exception as e:
             logger.error(f"Could not store smart organization learning: {e}")
     
@@ -696,10 +1188,33 @@ class FinderActions:
                 }
             }
             
-            requests.post('http://localhost:8080/send_message', json=notification_data, timeout=10)
+            self._registry_http.post('/send_message', json=notification_data)
         except Exception as e:
             logger.error(f"Could not send notification: {e}")
     
+    def _flush_memory_queue(self):
+        """Send queued memory writes in batches of up to MEMORY_BATCH_MAX or every MEMORY_BATCH_WINDOW"""
+        while True:
+            batch = [self._memory_queue.get()]
+            deadline = time.monotonic() + MEMORY_BATCH_WINDOW
+            while len(batch) < MEMORY_BATCH_MAX:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._memory_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            try:
+                response = self._memory_http.post('/store_batch', json=batch)
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                logger.error(f"Memory engine rejected {len(batch)} memories "
+                             f"({e.response.status_code}): {e.response.text[:200]}")
+            except Exception as e:
+                logger.error(f"Could not store {len(batch)} memories: {e}")
+    
     def _register_with_service_registry(self):
         """Register this service with the service registry"""
         try:
@@ -715,8 +1230,7 @@ class FinderActions:
                 }
             }
             
-            response = requests.post('http://localhost:8080/register', 
-                                   json=registration_data, timeout=10)
+            response = self._registry_http.post('/register', json=registration_data)
             
             if response.status_code == 200:
                 logger.info("Successfully registered with service registry")
@@ -734,6 +1248,15 @@ class FinderActions:
         """Stop the service and all watchers"""
         for observer in self.watched_directories.values():
             observer.stop()
+        for event_handler in self._watch_handlers.values():
+            event_handler.stop()
+        with self._meta_timer_lock:
+            if self._meta_save_timer is not None:
+                self._meta_save_timer.cancel()
+                self._meta_save_timer = None
+        self._save_meta_cache()
+        self._registry_http.close()
+        self._memory_http.close()
         logger.info("Finder Actions Service stopped")
 
 if __name__ == "__main__":
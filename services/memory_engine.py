@@ -2,27 +2,82 @@
 """
 MCP macOS Companion - Memory Engine
 Persistent memory with embeddings for intelligent recall
+
+Production entrypoint (one process: the FAISS index and SQLite writer live in memory):
+    gunicorn --chdir services 'memory_engine:create_app()' -k gthread -w 1 --threads 8 -b 0.0.0.0:8081
 """
 
 import sqlite3
-import json
+import bisect
+import hashlib
 import logging
+import queue
+import re
 import threading
 import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 import requests
 from sentence_transformers import SentenceTransformer
 import faiss
+import orjson
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Exact flat search for small corpora; IVF+PQ (compressed codes, probed cells) once large enough
+IVF_MIN_VECTORS = 10000
+IVF_MAX_LISTS = 1024
+IVF_TRAIN_POINTS_PER_LIST = 39  # FAISS needs ~39 training points per list for stable k-means
+PQ_SUBQUANTIZERS = 32  # 32 bytes per stored vector
+IVF_NPROBE = 16
+IVF_RETRAIN_GROWTH = 4  # retrain once the corpus reaches 4x the size it was trained on
+INDEX_VERSION = 1  # bump to invalidate trained indexes saved in faiss_meta
+
+# Concurrent encode() calls arriving within the window share one forward pass
+ENCODE_BATCH_MAX = 32
+ENCODE_BATCH_WINDOW = 0.005
+SEARCH_WORKERS = 4  # /search embeds the query on these while it builds its filters
+
+# Queries with a quoted phrase try FTS5 before the embedding model
+QUOTED_PHRASE_RX = re.compile(r'"[^"]+"')
+
+# /search responses with more results than this are streamed instead of built in one piece
+SEARCH_STREAM_MIN_RESULTS = 100
+
+# /stats and /categories bodies are reused for this long unless a store happens first
+SUMMARY_CACHE_TTL = 5.0
+
+# Single /store calls arriving within the window are written as one transaction
+STORE_BATCH_MAX = 256
+STORE_BATCH_WINDOW = 0.05
+
+# Query embeddings are cached in memory (LRU) and in the query_cache table across restarts
+QUERY_CACHE_MAX = 512
+QUERY_CACHE_TTL = 7 * 24 * 3600
+# New query embeddings are persisted off the /search path, batched like /store writes
+QUERY_CACHE_WRITE_BATCH_MAX = 256
+QUERY_CACHE_WRITE_WINDOW = 1.0
+
+# One long-lived WAL writer plus a pool of read-only connections
+READ_POOL_SIZE = 8
+SQLITE_PRAGMAS = (
+    'PRAGMA busy_timeout=30000',
+    'PRAGMA cache_size=-131072',  # 128 MiB page cache
+    'PRAGMA mmap_size=1073741824',  # serve reads from the page cache instead of pread()
+    'PRAGMA temp_store=MEMORY',
+)
+
 @dataclass
 class MemoryEntry:
     """A single memory entry with embeddings"""
@@ -38,6 +93,99 @@ class MemoryEntry:
         if self.tags is None:
             self.tags = []
 
+def memory_id_hash(memory_id: str) -> int:
+    """Stable non-negative 63-bit FAISS ID for a memory ID"""
+    return int.from_bytes(hashlib.blake2b(memory_id.encode(), digest_size=8).digest(), 'big') & 0x7fffffffffffffff
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, used by jsonify and request.json"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def _store_error(data: Any) -> Optional[str]:
+    """Why a /store body can't be stored, or None if it's valid"""
+    if not isinstance(data, dict):
+        return 'memory must be a JSON object'
+    if not isinstance(data.get('content'), str):
+        return 'content must be a string'
+    if not isinstance(data.get('id', ''), str) or not isinstance(data.get('category', ''), str):
+        return 'id and category must be strings'
+    timestamp = data.get('timestamp', 0)
+    if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)):
+        return 'timestamp must be a number'
+    return None
+
+def _stream_results(results: List[Dict[str, Any]]):
+    """Yield {"results": [...]} as JSON chunks, one per result"""
+    yield b'{"results":['
+    for i, result in enumerate(results):
+        if i:
+            yield b','
+        yield orjson.dumps(result)
+    yield b']}'
+
+def _drain_batch(pending: queue.Queue, max_size: int, window: float, size_of) -> list:
+    """Block for one item, then keep taking items until max_size is reached or the window closes"""
+    batch = [pending.get()]
+    size = size_of(batch[0])
+    deadline = time.monotonic() + window
+    
+    while size < max_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = pending.get(timeout=remaining)
+        except queue.Empty:
+            break
+        batch.append(item)
+        size += size_of(item)
+    return batch
+
+class BatchingEncoder:
+    """Coalesces concurrent encode requests into one sentence-transformer forward pass"""
+    
+    def __init__(self, model: SentenceTransformer, max_batch: int = ENCODE_BATCH_MAX,
+                 window: float = ENCODE_BATCH_WINDOW):
+        self.model = model
+        self.max_batch = max_batch
+        self.window = window
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="batching-encoder", daemon=True)
+        self._worker.start()
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Return L2-normalized float32 embeddings, one row per text"""
+        future: Future = Future()
+        self._queue.put((texts, future))
+        return future.result()
+    
+    def _run(self):
+        """Gather requests until the batch is full or the window closes, then encode them together"""
+        while True:
+            batch = _drain_batch(self._queue, self.max_batch, self.window, lambda item: len(item[0]))
+            
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                # encode() sorts by length internally, so mixed requests pad minimally
+                embeddings = self.model.encode(
+                    texts, batch_size=self.max_batch, convert_to_numpy=True, normalize_embeddings=True
+                )
+            except Exception as e:
+                logger.error(f"Batch encode of {len(texts)} texts failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(embeddings[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
 class MemoryEngine:
     """Intelligent memory system with embeddings and semantic search"""
     
@@ -45,25 +193,59 @@ class MemoryEngine:
         self.db_path = db_path
         self.port = port
         self.app = Flask(__name__)
+        self.app.json = ORJSONProvider(self.app)
         CORS(self.app)
         
         # Initialize sentence transformer for embeddings
         self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        if self.model.device.type in ('cuda', 'mps'):
+            self.model.half()  # FP16 halves matmul cost on GPU/Apple silicon; CPU stays FP32
+        self.encoder = BatchingEncoder(self.model)
         self.embedding_dim = 384  # Dimension of all-MiniLM-L6-v2
         
-        # Initialize FAISS index for vector search
-        self.index = faiss.IndexFlatIP(self.embedding_dim)  # Inner product for cosine similarity
-        self.id_to_index: Dict[str, int] = {}  # Map memory IDs to FAISS indices
+        # Initialize FAISS index for vector search; FAISS IDs are 63-bit hashes of memory IDs
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.embedding_dim))  # Inner product for cosine similarity
+        self.hash_to_id: Dict[int, str] = {}  # Map FAISS IDs back to memory IDs
+        self.index_trained_size = 0  # Corpus size the IVF index was trained on (0 = flat index)
+        # While a background retrain runs: FAISS ID -> embedding stored since its snapshot, replayed at swap
+        self.retrain_pending: Optional[Dict[int, np.ndarray]] = None
+        
+        # Filter structures so /search can restrict FAISS to matching IDs up front
+        self.id_filters: Dict[int, Tuple[str, float]] = {}  # FAISS ID -> (category, timestamp)
+        self.category_ids: Dict[str, Set[int]] = {}
+        self.ts_index: List[Tuple[float, int]] = []  # (timestamp, FAISS ID), sorted
+        
+        # /store requests waiting to be coalesced into one _store_entries call
+        self.store_queue: "queue.Queue[Tuple[str, Dict[str, Any], Future]]" = queue.Queue()
         
-        # Database connection with thread safety
+        # Database connections: db_lock serializes the single writer, readers come from a pool
         self.db_lock = threading.Lock()
+        self.writer: Optional[sqlite3.Connection] = None
+        self.readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        
+        # Serializes FAISS mutations against searches
+        self.index_lock = threading.Lock()
+        # Serialized /stats and /categories bodies: key -> (built_at, store_generation, body)
+        self.summary_cache: Dict[str, Tuple[float, int, bytes]] = {}
+        self.store_generation = 0  # bumped by every store
+        
+        self.search_pool = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+        
+        # Normalized query text -> query embedding, most recently used last
+        self.query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.query_cache_lock = threading.Lock()
+        # (norm_query, embedding blob, ts) rows waiting to be written to the query_cache table
+        self.query_cache_queue: "queue.Queue[Tuple[str, bytes, float]]" = queue.Queue()
         
         # Initialize database and FAISS index
         self._init_database()
         self._load_existing_embeddings()
+        self._load_query_cache()
         
         # Setup Flask routes
         self._setup_routes()
+        threading.Thread(target=self._store_flusher, name="store-flusher", daemon=True).start()
+        threading.Thread(target=self._query_cache_flusher, name="query-cache-flusher", daemon=True).start()
         
         # Service registration
         self._register_with_service_registry()
@@ -73,7 +255,12 @@ class MemoryEngine:
         import os
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
-        with sqlite3.connect(self.db_path) as conn:
+        self.writer = sqlite3.connect(self.db_path, check_same_thread=False)
+        # page_size only takes effect on a fresh database, and must precede the switch to WAL
+        for pragma in ('PRAGMA page_size=8192', 'PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL') + SQLITE_PRAGMAS:
+            self.writer.execute(pragma)
+        
+        with self._write() as conn:
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS memories (
                     id TEXT PRIMARY KEY,
@@ -94,89 +281,401 @@ class MemoryEngine:
                 CREATE INDEX IF NOT EXISTS idx_timestamp ON memories(timestamp)
             ''')
             
+            # FTS mirrors memories via external content, kept in sync by triggers
+            fts_sql = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'memories_fts'"
+            ).fetchone()
+            rebuild_fts = fts_sql is None or "content='memories'" not in fts_sql[0]
+            if rebuild_fts:
+                conn.execute('DROP TABLE IF EXISTS memories_fts')  # Pre-trigger standalone FTS table
+            
             conn.execute('''
                 CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
-                    id, content, category, tags
+                    content, category, tags, content='memories', content_rowid='rowid'
+                )
+            ''')
+            
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS memories_fts_insert AFTER INSERT ON memories BEGIN
+                    INSERT INTO memories_fts (rowid, content, category, tags)
+                    VALUES (new.rowid, new.content, new.category, new.tags);
+                END
+            ''')
+            
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS memories_fts_delete AFTER DELETE ON memories BEGIN
+                    INSERT INTO memories_fts (memories_fts, rowid, content, category, tags)
+                    VALUES ('delete', old.rowid, old.content, old.category, old.tags);
+                END
+            ''')
+            
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS memories_fts_update AFTER UPDATE OF content, category, tags ON memories BEGIN
+                    INSERT INTO memories_fts (memories_fts, rowid, content, category, tags)
+                    VALUES ('delete', old.rowid, old.content, old.category, old.tags);
+                    INSERT INTO memories_fts (rowid, content, category, tags)
+                    VALUES (new.rowid, new.content, new.category, new.tags);
+                END
+            ''')
+            
+            if rebuild_fts:
+                conn.execute("INSERT INTO memories_fts (memories_fts) VALUES ('rebuild')")
+            
+            # Trained (empty) IVF index plus the version/corpus size it was trained for
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS faiss_meta (
+                    key TEXT PRIMARY KEY,
+                    value BLOB
                 )
             ''')
+            
+            # Recent query embeddings so the cache is warm after a restart
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS query_cache (
+                    norm_query TEXT PRIMARY KEY,
+                    embedding BLOB NOT NULL,
+                    ts REAL NOT NULL
+                )
+            ''')
+        
+        # Readers open after the schema exists; WAL lets them run alongside the writer
+        read_uri = Path(self.db_path).absolute().as_uri() + '?mode=ro'
+        for _ in range(READ_POOL_SIZE):
+            conn = sqlite3.connect(read_uri, uri=True, check_same_thread=False)
+            for pragma in SQLITE_PRAGMAS:
+                conn.execute(pragma)
+            self.readers.put(conn)
+    
+    @contextmanager
+    def _read(self):
+        """Borrow a read-only connection from the pool"""
+        conn = self.readers.get()
+        try:
+            yield conn
+        finally:
+            self.readers.put(conn)
+    
+    @contextmanager
+    def _write(self):
+        """Use the writer connection in a transaction (committed on success, rolled back on error)"""
+        with self.db_lock, self.writer:
+            yield self.writer
     
     def _load_existing_embeddings(self):
         """Load existing embeddings into FAISS index"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute('SELECT id, embedding FROM memories WHERE embedding IS NOT NULL')
-            
-            for row in cursor:
-                memory_id, embedding_blob = row
-                if embedding_blob:
-                    embedding = np.frombuffer(embedding_blob, dtype=np.float32)
-                    # Normalize for cosine similarity
-                    embedding = embedding / np.linalg.norm(embedding)
-                    
-                    index_pos = self.index.ntotal
-                    self.index.add(embedding.reshape(1, -1))
-                    self.id_to_index[memory_id] = index_pos
+        rows, embeddings = self._read_all_embeddings()
+        
+        trained = self._trained_index_from_meta(len(rows))
+        if trained is None:
+            trained = self._train_index(embeddings)
+        index, trained_size = trained
+        
+        hashes = [memory_id_hash(memory_id) for memory_id, _, _ in rows]
+        self.index = self._filled_index(index, hashes, embeddings)
+        self.index_trained_size = trained_size
+        self.hash_to_id = {id_hash: memory_id for id_hash, (memory_id, _, _) in zip(hashes, rows)}
+        
+        self.id_filters = {}
+        self.category_ids = {}
+        for id_hash, (_, category, timestamp) in zip(hashes, rows):
+            self.id_filters[id_hash] = (category, float(timestamp))
+            self.category_ids.setdefault(category, set()).add(id_hash)
+        self.ts_index = sorted((timestamp, id_hash) for id_hash, (_, timestamp) in self.id_filters.items())
+    
+    def _read_all_embeddings(self) -> Tuple[List[Tuple[str, str, float]], np.ndarray]:
+        """Read every stored embedding as ((id, category, timestamp) rows, normalized (N, dim) float32 matrix)"""
+        with self._read() as conn:
+            rows = [
+                row
+                for row in conn.execute(
+                    'SELECT id, category, timestamp, embedding FROM memories WHERE embedding IS NOT NULL'
+                )
+                if row[3]
+            ]
+        
+        if not rows:
+            return [], np.empty((0, self.embedding_dim), dtype=np.float32)
+        
+        blobs = self._migrate_float32_embeddings([(row[0], row[3]) for row in rows])
+        
+        # Blobs are float16; upcast for FAISS
+        embeddings = np.frombuffer(b''.join(blobs), dtype=np.float16)
+        embeddings = embeddings.reshape(len(rows), self.embedding_dim).astype(np.float32)
+        # Normalize for cosine similarity, in place on the upcast copy
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return [row[:3] for row in rows], embeddings
+    
+    def _migrate_float32_embeddings(self, rows: List[Tuple[str, bytes]]) -> List[bytes]:
+        """Rewrite legacy float32 embedding blobs as float16, once"""
+        legacy_size = self.embedding_dim * np.dtype(np.float32).itemsize
+        converted = {
+            memory_id: np.frombuffer(blob, dtype=np.float32).astype(np.float16).tobytes()
+            for memory_id, blob in rows
+            if len(blob) == legacy_size
+        }
+        if not converted:
+            return [blob for _, blob in rows]
+        
+        with self._write() as conn:
+            conn.executemany(
+                'UPDATE memories SET embedding = ? WHERE id = ?',
+                [(blob, memory_id) for memory_id, blob in converted.items()]
+            )
+        logger.info(f"Migrated {len(converted)} float32 embeddings to float16")
+        return [converted.get(memory_id, blob) for memory_id, blob in rows]
+    
+    def _filled_index(self, index: faiss.Index, hashes: List[int], embeddings: np.ndarray) -> faiss.IndexIDMap2:
+        """Wrap an empty index in an ID map and add the corpus under its FAISS IDs"""
+        index = faiss.IndexIDMap2(index)
+        if hashes:
+            index.add_with_ids(embeddings, np.array(hashes, dtype=np.int64))
+        return index
+    
+    def _train_index(self, embeddings: np.ndarray) -> Tuple[faiss.Index, int]:
+        """Build an empty index for this corpus: flat below IVF_MIN_VECTORS, trained IVF+PQ above
+        
+        Returns (index, trained size), with trained size 0 for a flat index.
+        """
+        count = len(embeddings)
+        if count < IVF_MIN_VECTORS:
+            return faiss.IndexFlatIP(self.embedding_dim), 0
+        
+        nlist = min(IVF_MAX_LISTS, count // IVF_TRAIN_POINTS_PER_LIST)
+        index = faiss.index_factory(
+            self.embedding_dim, f"IVF{nlist},PQ{PQ_SUBQUANTIZERS}x8", faiss.METRIC_INNER_PRODUCT
+        )
+        
+        start_time = time.time()
+        index.train(embeddings)
+        index.nprobe = IVF_NPROBE
+        logger.info(f"Trained IVF{nlist},PQ{PQ_SUBQUANTIZERS} index on {count} vectors in {time.time() - start_time:.1f}s")
+        
+        # Save the trained, still-empty index so restarts can skip k-means
+        with self._write() as conn:
+            conn.executemany('INSERT OR REPLACE INTO faiss_meta (key, value) VALUES (?, ?)', [
+                ('version', str(INDEX_VERSION)),
+                ('trained_size', str(count)),
+                ('trained_index', faiss.serialize_index(index).tobytes())
+            ])
+        return index, count
+    
+    def _trained_index_from_meta(self, count: int) -> Optional[Tuple[faiss.Index, int]]:
+        """Reuse the saved trained index if it's current and the corpus hasn't outgrown it"""
+        if count < IVF_MIN_VECTORS:
+            return None
+        
+        with self._read() as conn:
+            meta = dict(conn.execute('SELECT key, value FROM faiss_meta'))
+        
+        if meta.get('version') != str(INDEX_VERSION) or 'trained_index' not in meta:
+            return None
+        trained_size = int(meta['trained_size'])
+        if count >= trained_size * IVF_RETRAIN_GROWTH:
+            return None
+        
+        index = faiss.deserialize_index(np.frombuffer(meta['trained_index'], dtype=np.uint8))
+        index.nprobe = IVF_NPROBE
+        return index, trained_size
+    
+    def _load_query_cache(self):
+        """Drop expired query embeddings and load the most recent ones into the LRU"""
+        cutoff = time.time() - QUERY_CACHE_TTL
+        with self._write() as conn:
+            conn.execute('DELETE FROM query_cache WHERE ts < ?', (cutoff,))
+            rows = conn.execute(
+                'SELECT norm_query, embedding FROM query_cache ORDER BY ts DESC LIMIT ?', (QUERY_CACHE_MAX,)
+            ).fetchall()
+        
+        for norm_query, blob in reversed(rows):
+            self.query_cache[norm_query] = np.frombuffer(blob, dtype=np.float32)
+    
+    def _query_embedding(self, query: str) -> np.ndarray:
+        """Normalized query embedding, served from the query cache when possible"""
+        # The model is uncased and whitespace-insensitive, so this key doesn't change the embedding
+        norm_query = ' '.join(query.lower().split())
+        
+        with self.query_cache_lock:
+            embedding = self.query_cache.get(norm_query)
+            if embedding is not None:
+                self.query_cache.move_to_end(norm_query)
+                return embedding
+        
+        embedding = self.encoder.encode([query])[0]
+        
+        with self.query_cache_lock:
+            self.query_cache[norm_query] = embedding
+            while len(self.query_cache) > QUERY_CACHE_MAX:
+                self.query_cache.popitem(last=False)
+        
+        self.query_cache_queue.put((norm_query, embedding.astype(np.float32).tobytes(), time.time()))
+        return embedding
+    
+    def _query_cache_flusher(self):
+        """Persist queued query embeddings in batches so /search never waits on a SQLite commit"""
+        while True:
+            rows = _drain_batch(self.query_cache_queue, QUERY_CACHE_WRITE_BATCH_MAX,
+                                QUERY_CACHE_WRITE_WINDOW, lambda row: 1)
+            try:
+                with self._write() as conn:
+                    conn.executemany(
+                        'INSERT OR REPLACE INTO query_cache (norm_query, embedding, ts) VALUES (?, ?, ?)', rows
+                    )
+            except Exception as e:
+                # Only the cross-restart cache is lost; the in-memory LRU already has these
+                logger.warning(f"Failed to persist {len(rows)} query embeddings: {e}")
+    
+    def _set_filters(self, id_hash: int, category: str, timestamp: float):
+        """Record (or replace) the category/timestamp /search can pre-filter a FAISS ID on"""
+        previous = self.id_filters.get(id_hash)
+        if previous is not None:
+            old_category, old_timestamp = previous
+            self.category_ids[old_category].discard(id_hash)
+            del self.ts_index[bisect.bisect_left(self.ts_index, (old_timestamp, id_hash))]
+        
+        self.id_filters[id_hash] = (category, timestamp)
+        self.category_ids.setdefault(category, set()).add(id_hash)
+        bisect.insort(self.ts_index, (timestamp, id_hash))
+    
+    def _filtered_ids(self, category: Optional[str], cutoff: Optional[float]) -> Optional[np.ndarray]:
+        """FAISS IDs passing the category/time filters, or None when unfiltered"""
+        if not category and cutoff is None:
+            return None
+        
+        ids: Optional[Set[int]] = self.category_ids.get(category, set()) if category else None
+        if cutoff is not None:
+            recent = (id_hash for _, id_hash in self.ts_index[bisect.bisect_left(self.ts_index, (cutoff,)):])
+            ids = set(recent) if ids is None else ids.intersection(recent)
+        return np.fromiter(ids, dtype=np.int64, count=len(ids))
+    
+    def _vector_candidates(self, query: str, limit: int, category: Optional[str],
+                           cutoff: Optional[float]) -> List[Tuple[str, float]]:
+        """(memory_id, cosine score) pairs from the vector index, best first"""
+        # Embed the query (normalized) in the background while the filters are built
+        embedding_future = self.search_pool.submit(self._query_embedding, query)
+        
+        # IDs that pass the filters; entries re-stored before the search runs are rechecked in SQL
+        with self.index_lock:
+            filter_ids = self._filtered_ids(category, cutoff)
+        selector = faiss.IDSelectorBatch(filter_ids) if filter_ids is not None else None
+        
+        query_embedding = embedding_future.result()
+        
+        # Search in FAISS, restricted to IDs that pass the filters
+        with self.index_lock:
+            candidates = self.index.ntotal if filter_ids is None else len(filter_ids)
+            
+            if candidates > 0:
+                k = min(limit, candidates)
+                if self.index_trained_size:
+                    search_params = None
+                    if selector is not None:
+                        search_params = faiss.SearchParametersIVF(sel=selector, nprobe=IVF_NPROBE)
+                    scores, indices = self.index.search(query_embedding.reshape(1, -1), k, params=search_params)
+                    scores, id_hashes = scores[0], indices[0]
+                else:
+                    scores, id_hashes = self._flat_search(query_embedding, k, filter_ids)
+                
+                # FAISS IDs map straight back to memory IDs
+                candidate_ids = [
+                    (self.hash_to_id[int(id_hash)], score)
+                    for id_hash, score in zip(id_hashes, scores)
+                    if id_hash != -1 and int(id_hash) in self.hash_to_id
+                ]
+            else:
+                candidate_ids = []
+        
+        return candidate_ids
+    
+    def _lexical_scores(self, query: str, limit: int, category: Optional[str],
+                        cutoff: Optional[float]) -> Dict[str, float]:
+        """FTS matches as memory_id -> BM25 score scaled to (0, 1], best match = 1"""
+        sql = '''
+            SELECT m.id, bm25(memories_fts)
+            FROM memories_fts fts
+            JOIN memories m ON m.rowid = fts.rowid
+            WHERE memories_fts MATCH ?
+        '''
+        params: List[Any] = [query]
+        if category:
+            sql += ' AND m.category = ?'
+            params.append(category)
+        if cutoff is not None:
+            sql += ' AND m.timestamp >= ?'
+            params.append(cutoff)
+        sql += ' ORDER BY bm25(memories_fts) LIMIT ?'
+        params.append(limit)
+        
+        try:
+            with self._read() as conn:
+                rows = conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            return {}  # Not valid FTS5 query syntax; semantic search handles it
+        
+        # bm25() is negative, lower is better
+        best = max((-rank for _, rank in rows), default=0.0)
+        if best <= 0:
+            return {memory_id: 1.0 for memory_id, _ in rows}
+        return {memory_id: -rank / best for memory_id, rank in rows}
+    
+    def _flat_search(self, query_embedding: np.ndarray, k: int,
+                     filter_ids: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, FAISS IDs) for a flat index: one matrix-vector product over its stored vectors"""
+        count = self.index.ntotal
+        flat = faiss.downcast_index(self.index.index)
+        # Zero-copy view of the flat index's storage; IDs are parallel to it
+        vectors = faiss.rev_swig_ptr(flat.get_xb(), count * self.embedding_dim).reshape(count, self.embedding_dim)
+        ids = faiss.vector_to_array(self.index.id_map)
+        
+        scores = vectors @ query_embedding
+        if filter_ids is not None:
+            scores[~np.isin(ids, filter_ids)] = -np.inf
+        
+        # Partial selection, then sort only the k winners
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return scores[top], ids[top]
+    
+    def _needs_retrain(self) -> bool:
+        """Whether the corpus has grown past what the current index was built for"""
+        if self.index_trained_size == 0:
+            return self.index.ntotal >= IVF_MIN_VECTORS
+        return self.index.ntotal >= self.index_trained_size * IVF_RETRAIN_GROWTH
     
     def _setup_routes(self):
         """Setup Flask API routes"""
         
         @self.app.route('/store', methods=['POST'])
         def store_memory():
-            data = request.json
+            data = request.get_json(silent=True)
+            # Checked before queueing, since one bad memory would fail the whole coalesced batch
+            error = _store_error(data)
+            if error:
+                return jsonify({'error': error}), 400
             memory_id = data.get('id', f"mem_{int(time.time() * 1000)}")
             
-            # Create embedding
-            content = data['content']
-            embedding = self.model.encode([content])[0]
-            embedding = embedding / np.linalg.norm(embedding)  # Normalize
+            # Coalesced with concurrent /store calls; returns once the write is committed
+            future: Future = Future()
+            self.store_queue.put((memory_id, data, future))
+            future.result()
             
-            # Store in database
-            entry = MemoryEntry(
-                id=memory_id,
-                content=content,
-                category=data.get('category', 'general'),
-                timestamp=data.get('timestamp', time.time()),
-                metadata=data.get('metadata', {}),
-                tags=data.get('tags', [])
-            )
+            return jsonify({'status': 'stored', 'id': memory_id})
+        
+        @self.app.route('/store_batch', methods=['POST'])
+        def store_memory_batch():
+            """Store several memories with one embedding pass and one transaction"""
+            body = request.json or []
+            items = body.get('items', []) if isinstance(body, dict) else body
+            for i, data in enumerate(items):
+                error = _store_error(data)
+                if error:
+                    return jsonify({'error': f'item {i}: {error}'}), 400
+            now_ms = int(time.time() * 1000)
+            pairs = [(data.get('id', f"mem_{now_ms}_{i}"), data) for i, data in enumerate(items)]
             
-            with self.db_lock:
-                with sqlite3.connect(self.db_path) as conn:
-                    conn.execute('''
-                        INSERT OR REPLACE INTO memories 
-                        (id, content, category, timestamp, metadata, tags, embedding)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        entry.id,
-                        entry.content,
-                        entry.category,
-                        entry.timestamp,
-                        json.dumps(entry.metadata),
-                        json.dumps(entry.tags),
-                        embedding.tobytes()
-                    ))
-                    
-                    # Update FTS index
-                    conn.execute('''
-                        INSERT OR REPLACE INTO memories_fts 
-                        (id, content, category, tags)
-                        VALUES (?, ?, ?, ?)
-                    ''', (
-                        entry.id,
-                        entry.content,
-                        entry.category,
-                        ' '.join(entry.tags)
-                    ))
-                
-                # Add to FAISS index
-                if memory_id in self.id_to_index:
-                    # Remove old entry and rebuild index (FAISS doesn't support updates)
-                    self._rebuild_faiss_index()
-                
-                index_pos = self.index.ntotal
-                self.index.add(embedding.reshape(1, -1))
-                self.id_to_index[memory_id] = index_pos
+            if pairs:
+                self._store_entries(pairs)
             
-            return jsonify({'status': 'stored', 'id': memory_id})
+            return jsonify({'status': 'stored', 'ids': [memory_id for memory_id, _ in pairs]})
         
         @self.app.route('/search', methods=['POST'])
         def search_memories():
@@ -186,61 +685,71 @@ class MemoryEngine:
             category_filter = data.get('category')
             time_range = data.get('time_range')  # In hours
             
-            # Get embedding for query
-            query_embedding = self.model.encode([query])[0]
-            query_embedding = query_embedding / np.linalg.norm(query_embedding)
+            cutoff_time = time.time() - (time_range * 3600) if time_range else None
             
-            # Search in FAISS
-            if self.index.ntotal > 0:
-                scores, indices = self.index.search(query_embedding.reshape(1, -1), 
-                                                  min(limit * 2, self.index.ntotal))
-                
-                # Get memory IDs from indices
-                candidate_ids = []
-                for i, idx in enumerate(indices[0]):
-                    if idx != -1:  # Valid result
-                        for mem_id, mem_idx in self.id_to_index.items():
-                            if mem_idx == idx:
-                                candidate_ids.append((mem_id, scores[0][i]))
-                                break
+            # Quoted phrases go to FTS first; enough exact hits means the model never runs
+            lexical_scores = self._lexical_scores(query, limit, category_filter, cutoff_time) \
+                if QUOTED_PHRASE_RX.search(query) else {}
+            
+            # similarity_score is always the cosine, so it is None for hits the model never scored;
+            # lexical hits report their normalized BM25 separately as lexical_score
+            cosine_scores: Dict[str, float] = {}
+            if len(lexical_scores) >= limit:
+                candidate_ids = sorted(lexical_scores.items(), key=lambda item: item[1], reverse=True)[:limit]
             else:
-                candidate_ids = []
+                candidate_ids = self._vector_candidates(query, limit, category_filter, cutoff_time)
+                cosine_scores = {memory_id: float(score) for memory_id, score in candidate_ids}
+                if lexical_scores:
+                    # Hybrid rerank: equal weight to normalized BM25 and cosine similarity
+                    combined = {memory_id: 0.5 * score for memory_id, score in cosine_scores.items()}
+                    for memory_id, bm25_score in lexical_scores.items():
+                        combined[memory_id] = combined.get(memory_id, 0.0) + 0.5 * bm25_score
+                    candidate_ids = sorted(combined.items(), key=lambda item: item[1], reverse=True)
+            
+            # Fetch all candidates in one query, filtering in SQL
+            sql = f'''
+                SELECT id, content, category, timestamp, metadata, tags
+                FROM memories WHERE id IN ({','.join('?' * len(candidate_ids))})
+            '''
+            params: List[Any] = [memory_id for memory_id, _ in candidate_ids]
+            if category_filter:
+                sql += ' AND category = ?'
+                params.append(category_filter)
+            if cutoff_time is not None:
+                sql += ' AND timestamp >= ?'
+                params.append(cutoff_time)
             
-            # Fetch full memory entries and apply filters
+            rows = {}
+            if candidate_ids:
+                with self._read() as conn:
+                    rows = {row[0]: row[1:] for row in conn.execute(sql, params)}
+            
+            # Reattach scores in rank order
             results = []
-            with sqlite3.connect(self.db_path) as conn:
-                for memory_id, score in candidate_ids:
-                    cursor = conn.execute('''
-                        SELECT content, category, timestamp, metadata, tags
-                        FROM memories WHERE id = ?
-                    ''', (memory_id,))
-                    
-                    row = cursor.fetchone()
-                    if row:
-                        content, category, timestamp, metadata_json, tags_json = row
-                        
-                        # Apply filters
-                        if category_filter and category != category_filter:
-                            continue
-                        
-                        if time_range:
-                            cutoff_time = time.time() - (time_range * 3600)
-                            if timestamp < cutoff_time:
-                                continue
-                        
-                        results.append({
-                            'id': memory_id,
-                            'content': content,
-                            'category': category,
-                            'timestamp': timestamp,
-                            'metadata': json.loads(metadata_json),
-                            'tags': json.loads(tags_json),
-                            'similarity_score': float(score)
-                        })
-                        
-                        if len(results) >= limit:
-                            break
+            for memory_id, _ in candidate_ids:
+                row = rows.get(memory_id)
+                if row is None:
+                    continue
+                
+                content, category, timestamp, metadata_json, tags_json = row
+                result = {
+                    'id': memory_id,
+                    'content': content,
+                    'category': category,
+                    'timestamp': timestamp,
+                    'metadata': orjson.loads(metadata_json),
+                    'tags': orjson.loads(tags_json),
+                    'similarity_score': cosine_scores.get(memory_id)
+                }
+                if memory_id in lexical_scores:
+                    result['lexical_score'] = lexical_scores[memory_id]
+                results.append(result)
+                
+                if len(results) >= limit:
+                    break
             
+            if len(results) > SEARCH_STREAM_MIN_RESULTS:
+                return self.app.response_class(_stream_results(results), mimetype='application/json')
             return jsonify({'results': results})
         
         @self.app.route('/search', methods=['GET'])
@@ -288,11 +797,11 @@ class MemoryEngine:
             query = data['query']
             limit = data.get('limit', 10)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._read() as conn:
                 cursor = conn.execute('''
                     SELECT m.id, m.content, m.category, m.timestamp, m.metadata, m.tags
                     FROM memories_fts fts
-                    JOIN memories m ON fts.id = m.id
+                    JOIN memories m ON m.rowid = fts.rowid
                     WHERE memories_fts MATCH ?
                     ORDER BY rank
                     LIMIT ?
@@ -306,8 +815,8 @@ class MemoryEngine:
                         'content': content,
                         'category': category,
                         'timestamp': timestamp,
-                        'metadata': json.loads(metadata_json),
-                        'tags': json.loads(tags_json)
+                        'metadata': orjson.loads(metadata_json),
+                        'tags': orjson.loads(tags_json)
                     })
             
             return jsonify({'results': results})
@@ -315,31 +824,37 @@ class MemoryEngine:
         @self.app.route('/categories', methods=['GET'])
         def get_categories():
             """Get all unique categories"""
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute('SELECT DISTINCT category FROM memories')
-                categories = [row[0] for row in cursor]
+            def build():
+                with self._read() as conn:
+                    cursor = conn.execute('SELECT DISTINCT category FROM memories')
+                    categories = [row[0] for row in cursor]
+                
+                return {'categories': categories}
             
-            return jsonify({'categories': categories})
+            return self._cached_summary('categories', build)
         
         @self.app.route('/stats', methods=['GET'])
         def get_stats():
             """Get memory statistics"""
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute('SELECT COUNT(*) FROM memories')
-                total_memories = cursor.fetchone()[0]
+            def build():
+                with self._read() as conn:
+                    cursor = conn.execute('SELECT COUNT(*) FROM memories')
+                    total_memories = cursor.fetchone()[0]
+                    
+                    cursor = conn.execute('''
+                        SELECT category, COUNT(*) 
+                        FROM memories 
+                        GROUP BY category
+                    ''')
+                    category_counts = dict(cursor.fetchall())
                 
-                cursor = conn.execute('''
-                    SELECT category, COUNT(*) 
-                    FROM memories 
-                    GROUP BY category
-                ''')
-                category_counts = dict(cursor.fetchall())
+                return {
+                    'total_memories': total_memories,
+                    'category_counts': category_counts,
+                    'faiss_index_size': self.index.ntotal
+                }
             
-            return jsonify({
-                'total_memories': total_memories,
-                'category_counts': category_counts,
-                'faiss_index_size': self.index.ntotal
-            })
+            return self._cached_summary('stats', build)
         
         @self.app.route('/health', methods=['GET'])
         def health():
@@ -349,23 +864,133 @@ class MemoryEngine:
                 'total_memories': self.index.ntotal
             })
     
-    def _rebuild_faiss_index(self):
-        """Rebuild FAISS index from database"""
-        self.index = faiss.IndexFlatIP(self.embedding_dim)
-        self.id_to_index.clear()
+    def _cached_summary(self, key: str, build):
+        """Serve build()'s JSON from a short-lived cache that any store invalidates"""
+        now = time.time()
+        cached = self.summary_cache.get(key)
+        if cached and cached[1] == self.store_generation and now - cached[0] < SUMMARY_CACHE_TTL:
+            body = cached[2]
+        else:
+            # Read the generation first so a store racing with build() leaves this entry stale
+            generation = self.store_generation
+            body = orjson.dumps(build())
+            self.summary_cache[key] = (now, generation, body)
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute('SELECT id, embedding FROM memories WHERE embedding IS NOT NULL')
+        return self.app.response_class(body, mimetype='application/json')
+    
+    def _store_flusher(self):
+        """Write queued /store requests in batches"""
+        while True:
+            batch = _drain_batch(self.store_queue, STORE_BATCH_MAX, STORE_BATCH_WINDOW, lambda item: 1)
+            try:
+                self._store_entries([(memory_id, data) for memory_id, data, _ in batch])
+            except Exception as e:
+                logger.error(f"Failed to store batch of {len(batch)} memories: {e}")
+                if len(batch) == 1:
+                    batch[0][2].set_exception(e)
+                    continue
+                
+                # Retry one by one so only the failing requests see an error
+                for memory_id, data, future in batch:
+                    try:
+                        self._store_entries([(memory_id, data)])
+                    except Exception as item_error:
+                        future.set_exception(item_error)
+                    else:
+                        future.set_result(None)
+                continue
             
-            for row in cursor:
-                memory_id, embedding_blob = row
-                if embedding_blob:
-                    embedding = np.frombuffer(embedding_blob, dtype=np.float32)
-                    embedding = embedding / np.linalg.norm(embedding)
-                    
-                    index_pos = self.index.ntotal
-                    self.index.add(embedding.reshape(1, -1))
-                    self.id_to_index[memory_id] = index_pos
+            for _, _, future in batch:
+                future.set_result(None)
+    
+    def _store_entries(self, pairs: List[Tuple[str, Dict[str, Any]]]):
+        """Embed and persist (memory_id, data) pairs, updating the FAISS index"""
+        # A repeated ID keeps its last data, matching sequential upserts
+        pairs = list(dict(pairs).items())
+        
+        # Create normalized embeddings in a single batched encode
+        embeddings = self.encoder.encode([data['content'] for _, data in pairs])
+        
+        entries = [
+            MemoryEntry(
+                id=memory_id,
+                content=data['content'],
+                category=data.get('category', 'general'),
+                timestamp=data.get('timestamp', time.time()),
+                metadata=data.get('metadata', {}),
+                tags=data.get('tags', [])
+            )
+            for memory_id, data in pairs
+        ]
+        
+        with self.index_lock:
+            with self._write() as conn:
+                # Upsert (not REPLACE) so the update trigger keeps FTS in sync
+                conn.executemany('''
+                    INSERT INTO memories 
+                    (id, content, category, timestamp, metadata, tags, embedding)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        content = excluded.content,
+                        category = excluded.category,
+                        timestamp = excluded.timestamp,
+                        metadata = excluded.metadata,
+                        tags = excluded.tags,
+                        embedding = excluded.embedding
+                ''', [
+                    (
+                        entry.id,
+                        entry.content,
+                        entry.category,
+                        entry.timestamp,
+                        orjson.dumps(entry.metadata).decode(),
+                        orjson.dumps(entry.tags).decode(),
+                        embedding.astype(np.float16).tobytes()
+                    )
+                    for entry, embedding in zip(entries, embeddings)
+                ])
+            
+            # Update FAISS index: drop vectors for replaced IDs, then add the batch
+            hashes = np.array([memory_id_hash(entry.id) for entry in entries], dtype=np.int64)
+            replaced = [int(id_hash) for id_hash in hashes if int(id_hash) in self.hash_to_id]
+            if replaced:
+                self.index.remove_ids(faiss.IDSelectorArray(np.array(replaced, dtype=np.int64)))
+            
+            self.index.add_with_ids(np.ascontiguousarray(embeddings, dtype=np.float32), hashes)
+            self.hash_to_id.update(zip(hashes.tolist(), (entry.id for entry in entries)))
+            for id_hash, entry in zip(hashes.tolist(), entries):
+                self._set_filters(id_hash, entry.category, float(entry.timestamp))
+            self.store_generation += 1
+            
+            if self.retrain_pending is not None:
+                # A retrain is training from an older snapshot; remember these for the swap
+                self.retrain_pending.update(zip(hashes.tolist(), np.asarray(embeddings, dtype=np.float32)))
+            elif self._needs_retrain():
+                # Training takes minutes at IVF sizes, so it runs off the request path
+                self.retrain_pending = {}
+                threading.Thread(target=self._retrain_faiss_index, name="faiss-retrain", daemon=True).start()
+    
+    def _retrain_faiss_index(self):
+        """Train an index for the grown corpus from a snapshot, then swap it in and replay later stores"""
+        try:
+            rows, embeddings = self._read_all_embeddings()
+            index, trained_size = self._train_index(embeddings)
+            index = self._filled_index(index, [memory_id_hash(memory_id) for memory_id, _, _ in rows], embeddings)
+        except Exception as e:
+            logger.error(f"Failed to retrain FAISS index: {e}")
+            with self.index_lock:
+                self.retrain_pending = None
+            return
+        
+        with self.index_lock:
+            if self.retrain_pending:
+                replay = np.fromiter(self.retrain_pending, dtype=np.int64, count=len(self.retrain_pending))
+                index.remove_ids(faiss.IDSelectorArray(replay))
+                index.add_with_ids(np.stack(list(self.retrain_pending.values())), replay)
+            self.index = index
+            self.index_trained_size = trained_size
+            self.retrain_pending = None
+        logger.info(f"Swapped in retrained FAISS index ({index.ntotal} vectors)")
     
     def _register_with_service_registry(self):
         """Register this service with the service registry"""
@@ -393,10 +1018,14 @@ class MemoryEngine:
             logger.error(f"Could not register with service registry: {e}")
     
     def start(self):
-        """Start the memory engine service"""
+        """Start the memory engine service (development server; use create_app() under gunicorn in production)"""
         logger.info(f"Starting Memory Engine on port {self.port}")
         self.app.run(host='0.0.0.0', port=self.port, debug=False, threaded=True)
 
+def create_app() -> Flask:
+    """WSGI entrypoint: build the engine and return its Flask app"""
+    return MemoryEngine().app
+
 if __name__ == "__main__":
     engine = MemoryEngine()
     try:
@@ -7,6 +7,8 @@ import json
 import subprocess
 import os
 import logging
+import time
+from itertools import islice
 from flask import Flask, request, jsonify
 
 app = Flask(__name__)
@@ -45,6 +47,28 @@ def process_command():
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+EMAIL_EXTENSIONS = {'.eml', '.msg', '.mbox'}
+EMAIL_SEARCH_TIMEOUT = 8  # seconds per search path, as the old find timeout
+
+def walk_email_files(root, exts=EMAIL_EXTENSIONS, max_depth=3, deadline=None):
+    """Yield paths under root (at most max_depth levels down) whose extension is in exts"""
+    stack = [(root, 0)]
+    while stack:
+        # Give up once the deadline passes, as the old find timeout did
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"Email search in {root} took too long")
+        path, depth = stack.pop()
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    # Mail.app .mbox bundles are directories, so match names before descending
+                    if os.path.splitext(entry.name)[1].lower() in exts:
+                        yield entry.path
+                    if depth + 1 < max_depth and entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, depth + 1))
+        except OSError:
+            continue  # Unreadable directory; keep walking the rest
+
 def handle_nas_raid_email_search(original_command):
     """Handle the specific NAS RAID email search command"""
     results = []
@@ -64,14 +88,11 @@ def handle_nas_raid_email_search(original_command):
         if os.path.exists(path):
             try:
                 # Quick search for email files
-                email_search = subprocess.run(
-                    ["find", path, "-name", "*.eml", "-o", "-name", "*.msg", "-o", "-name", "*.mbox", "-maxdepth", "3"],
-                    capture_output=True, text=True, timeout=8
-                )
+                deadline = time.monotonic() + EMAIL_SEARCH_TIMEOUT
+                email_files = list(islice(walk_email_files(path, deadline=deadline), 5))  # First 5 files
                 
-                if email_search.stdout.strip():
+                if email_files:
                     found_emails = True
-                    email_files = email_search.stdout.strip().split('\n')[:5]  # First 5 files
                     
                     # Get unique parent folders
                     folders = set()
@@ -96,7 +117,7 @@ def handle_nas_raid_email_search(original_command):
                     })
                     break
                     
-            except subprocess.TimeoutExpired:
+            except TimeoutError:
                 results.append({"action": "search", "status": "timeout", "path": path})
             except Exception as e:
                 results.append({"action": "search", "status": "error", "path": path, "error": str(e)})
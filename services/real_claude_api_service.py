@@ -5,127 +5,258 @@ Sends voice commands to the actual Claude API for processing
 """
 
 import asyncio
+import fnmatch
 import json
 import logging
-import requests
 import subprocess
 import os
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any
+import httpx
+import orjson
+import uvicorn
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
+# Created on startup so its connection pool lives on the server's event loop
+http_client: httpx.AsyncClient = None
 
-@app.route('/health', methods=['GET'])
-def health():
-    return jsonify({
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared HTTP client for the server's lifetime"""
+    global http_client
+    # Keep-alive pool so bursts of memory stores reuse loopback connections
+    http_client = httpx.AsyncClient(timeout=5, limits=httpx.Limits(max_keepalive_connections=16))
+    try:
+        yield
+    finally:
+        await http_client.aclose()
+
+app = FastAPI(title="Real Claude API Integration Service", version="1.0.0", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+class CommandIn(BaseModel):
+    command: str = ""
+    timestamp: Any = ""
+
+@app.get('/health')
+async def health():
+    return {
         "status": "healthy",
         "service": "real_claude_api",
         "port": 8090,
         "capabilities": ["claude_api", "voice_processing", "action_execution"]
-    })
+    }
 
-@app.route('/process_command', methods=['POST'])
-def process_command():
+@app.post('/process_command')
+async def process_command(data: CommandIn):
     """Process voice commands using the real Claude API"""
     try:
-        data = request.get_json()
-        command = data.get('command', '')
+        command = data.command
         
         if not command:
-            return jsonify({"error": "No command provided"}), 400
+            return JSONResponse({"error": "No command provided"}, status_code=400)
         
         logger.info(f"Sending voice command to real Claude: '{command}'")
         
-        # Send to real Claude API
-        claude_response = call_real_claude_api(command)
-        
-        # Parse Claude's response for actions
-        actions = parse_claude_actions(claude_response)
+        # Send to real Claude API and parse its response for actions (cached per command)
+        _, actions, claude_response_json = plan_command(command)
         
         # Execute the actions
-        results = execute_actions(actions)
+        results = await execute_actions(actions)
         
-        return jsonify({
+        # Encoded with orjson in one pass; the cached response string is spliced in pre-encoded
+        return Response(orjson.dumps({
             "status": "success",
             "result": {
                 "command": command,
-                "claude_response": claude_response,
+                "claude_response": claude_response_json,
                 "actions_executed": len(actions),
                 "results": results,
-                "timestamp": data.get('timestamp', '')
+                "timestamp": data.timestamp
             }
-        })
+        }), media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error processing command: {e}")
-        return jsonify({
+        return JSONResponse({
             "status": "error", 
             "message": str(e)
-        }), 500
+        }, status_code=500)
 
-def call_real_claude_api(command):
-    """Call the actual Claude API using the analysis tool method"""
+# Repeated voice commands ("take a screenshot") reuse their parsed plan
+PLAN_CACHE_SIZE = 1024
+
+# command -> (claude_response, actions, claude_response JSON fragment), most recently used last
+_plan_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+def plan_command(command):
+    """Claude's response for a command, the actions parsed from it, and the response as a JSON fragment"""
+    plan = _plan_cache.get(command)
+    if plan is not None:
+        _plan_cache.move_to_end(command)
+        return plan
+    
     try:
-        # For now, let's create an intelligent response using the available context
-        # This simulates what the real Claude API would return
-        return create_intelligent_response(command)
-            
+        claude_response = call_real_claude_api(command)
+        cacheable = True
     except Exception as e:
         logger.error(f"Failed to process with Claude: {e}")
-        return create_fallback_response(command)
+        claude_response = create_fallback_response(command)
+        cacheable = False  # a transient failure must not stick to the command
+    
+    # Only replies that parse to real JSON actions are cached; anything else is re-asked next time
+    try:
+        actions = _json_actions(claude_response)
+    except Exception:
+        actions = None
+    if not isinstance(actions, list) or not actions:
+        actions = parse_claude_actions(claude_response)
+        cacheable = False
+    
+    plan = (claude_response, tuple(actions), orjson.Fragment(orjson.dumps(claude_response)))
+    if cacheable:
+        _plan_cache[command] = plan
+        while len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plan
+
+def call_real_claude_api(command):
+    """Call the actual Claude API using the analysis tool method"""
+    # For now, let's create an intelligent response using the available context
+    # This simulates what the real Claude API would return
+    return create_intelligent_response(command)
+
+def _json_escape(text):
+    """Escape text for splicing into a JSON string literal"""
+    return json.dumps(text)[1:-1]
+
+_NAS_RAID_EMAIL_ACTIONS = [
+    {"action": "search", "path": "/Volumes/NAS RAID", "pattern": "*.eml,*.msg,*.mbox", "description": "searching for email files"},
+    {"action": "search", "path": "/Users/mark/Desktop/NAS RAID", "pattern": "*.eml,*.msg,*.mbox", "description": "searching for email files"},
+    {"action": "respond", "text": "I'm searching the NAS RAID folder for email files and will open any folders containing them."}
+]
+_SCREENSHOT_ACTIONS = [
+    {"action": "screenshot", "save_path": "/Users/mark/Desktop/screenshot.png"},
+    {"action": "respond", "text": "I've taken a screenshot and saved it to your desktop."}
+]
+_OPEN_FOLDER_ACTIONS = [
+    {"action": "open", "target": "__FOLDER__", "type": "folder"},
+    {"action": "respond", "text": "I'm opening the __FOLDER__ folder."}
+]
+
+# Canned responses serialized once at import; __COMMAND__/__FOLDER__ are filled per call
+_RESPONSE_TEMPLATES = {name: json.dumps(body) for name, body in {
+    "open_2tb": {
+        "actions": [
+            {"action": "open", "target": "2TB", "type": "folder"},
+            {"action": "open", "target": "2TBHDD", "type": "folder"},
+            {"action": "respond", "text": "I'm opening your 2TB external drive. You should see a Finder window open shortly."}
+        ],
+        "response": "I'm opening your 2TB external drive for you. A Finder window should appear showing the contents."
+    },
+    "2tb_default": {
+        "actions": [
+            {"action": "open", "target": "2TB", "type": "folder"},
+            {"action": "search", "path": "/Volumes/2TB", "pattern": "*default*", "description": "searching for default folders in 2TB drive"},
+            {"action": "respond", "text": "I've opened your 2TB drive and I'm looking for default content inside it."}
+        ],
+        "response": "I've opened your 2TB external hard drive and I'm examining what default content is inside it."
+    },
+    "nas_raid_email": {
+        "actions": _NAS_RAID_EMAIL_ACTIONS,
+        "response": "I'll search through the NAS RAID folder for email files and open the folders containing them."
+    },
+    "screenshot": {
+        "actions": _SCREENSHOT_ACTIONS,
+        "response": "I've taken a screenshot for you and saved it to your desktop."
+    },
+    "open_folder": {
+        "actions": _OPEN_FOLDER_ACTIONS,
+        "response": "I'm opening the __FOLDER__ folder for you."
+    },
+    "complex": {
+        "actions": [
+            {"action": "respond", "text": "I understand you said: '__COMMAND__'. This is a complex request that I'm analyzing to determine the best actions to take."}
+        ],
+        "response": "I received your command: '__COMMAND__'. Let me process this and determine the best way to help you."
+    },
+    "fallback_nas_raid_email": {
+        "actions": _NAS_RAID_EMAIL_ACTIONS,
+        "response": "I'll search through the NAS RAID folder for email files. Note: I'm using a fallback since the Claude API isn't available right now."
+    },
+    "fallback_screenshot": {
+        "actions": _SCREENSHOT_ACTIONS,
+        "response": "I've taken a screenshot for you."
+    },
+    "fallback_open_folder": {
+        "actions": _OPEN_FOLDER_ACTIONS,
+        "response": "I'm opening the __FOLDER__ folder for you."
+    },
+    "fallback": {
+        "actions": [
+            {"action": "respond", "text": "I received your command: '__COMMAND__'. I'm processing this using a fallback system since the Claude API isn't available."}
+        ],
+        "response": "I heard: '__COMMAND__'. I'm processing this with a fallback system."
+    },
+}.items()}
+
+# Every keyword the command routers test for
+_ROUTER_KEYWORDS = ("open", "2tb", "two terabyte", "terabyte", "drive", "count", "default",
+                    "nas raid", "email", "screenshot", "capture", "folder")
+
+# Single-pass keyword scan when pyahocorasick is installed
+try:
+    import ahocorasick
+    
+    _ROUTER_AC = ahocorasick.Automaton()
+    for _keyword in _ROUTER_KEYWORDS:
+        _ROUTER_AC.add_word(_keyword, _keyword)
+    _ROUTER_AC.make_automaton()
+except ImportError:
+    _ROUTER_AC = None
+
+def _command_keywords(command_lower):
+    """Router keywords occurring anywhere in the lowercased command"""
+    if _ROUTER_AC is None:
+        return {keyword for keyword in _ROUTER_KEYWORDS if keyword in command_lower}
+    return {keyword for _, keyword in _ROUTER_AC.iter(command_lower)}
 
 def create_intelligent_response(command):
     """Create an intelligent response that mimics Claude's reasoning"""
     command_lower = command.lower()
+    hits = _command_keywords(command_lower)
     
     # Handle opening 2TB drive specifically
-    if ("open" in command_lower and ("2tb" in command_lower or "two terabyte" in command_lower)) or ("open" in command_lower and "drive" in command_lower):
-        return json.dumps({
-            "actions": [
-                {"action": "open", "target": "2TB", "type": "folder"},
-                {"action": "open", "target": "2TBHDD", "type": "folder"},
-                {"action": "respond", "text": "I'm opening your 2TB external drive. You should see a Finder window open shortly."}
-            ],
-            "response": "I'm opening your 2TB external drive for you. A Finder window should appear showing the contents."
-        })
+    if "open" in hits and hits & {"2tb", "two terabyte", "drive"}:
+        return _RESPONSE_TEMPLATES["open_2tb"]
     
     # Handle the original complex command
-    elif "2tb" in command_lower or "two terabyte" in command_lower or "terabyte" in command_lower:
-        if "count" in command_lower or "default" in command_lower:
-            return json.dumps({
-                "actions": [
-                    {"action": "open", "target": "2TB", "type": "folder"},
-                    {"action": "search", "path": "/Volumes/2TB", "pattern": "*default*", "description": "searching for default folders in 2TB drive"},
-                    {"action": "respond", "text": "I've opened your 2TB drive and I'm looking for default content inside it."}
-                ],
-                "response": "I've opened your 2TB external hard drive and I'm examining what default content is inside it."
-            })
+    elif hits & {"2tb", "two terabyte", "terabyte"}:
+        if hits & {"count", "default"}:
+            return _RESPONSE_TEMPLATES["2tb_default"]
     
-    elif "nas raid" in command_lower and "email" in command_lower:
-        return json.dumps({
-            "actions": [
-                {"action": "search", "path": "/Volumes/NAS RAID", "pattern": "*.eml,*.msg,*.mbox", "description": "searching for email files"},
-                {"action": "search", "path": "/Users/mark/Desktop/NAS RAID", "pattern": "*.eml,*.msg,*.mbox", "description": "searching for email files"},
-                {"action": "respond", "text": "I'm searching the NAS RAID folder for email files and will open any folders containing them."}
-            ],
-            "response": "I'll search through the NAS RAID folder for email files and open the folders containing them."
-        })
+    elif {"nas raid", "email"} <= hits:
+        return _RESPONSE_TEMPLATES["nas_raid_email"]
     
-    elif "screenshot" in command_lower or "capture" in command_lower:
-        return json.dumps({
-            "actions": [
-                {"action": "screenshot", "save_path": "/Users/mark/Desktop/screenshot.png"},
-                {"action": "respond", "text": "I've taken a screenshot and saved it to your desktop."}
-            ],
-            "response": "I've taken a screenshot for you and saved it to your desktop."
-        })
+    elif hits & {"screenshot", "capture"}:
+        return _RESPONSE_TEMPLATES["screenshot"]
     
-    elif "open" in command_lower and "folder" in command_lower:
+    elif {"open", "folder"} <= hits:
         # Extract folder name
         words = command_lower.split()
         folder_candidates = []
@@ -135,79 +266,82 @@ def create_intelligent_response(command):
         
         folder_name = folder_candidates[0] if folder_candidates else "specified folder"
         
-        return json.dumps({
-            "actions": [
-                {"action": "open", "target": folder_name, "type": "folder"},
-                {"action": "respond", "text": f"I'm opening the {folder_name} folder."}
-            ],
-            "response": f"I'm opening the {folder_name} folder for you."
-        })
+        return _RESPONSE_TEMPLATES["open_folder"].replace("__FOLDER__", _json_escape(folder_name))
     
     else:
         # For other complex commands, provide a helpful response
-        return json.dumps({
-            "actions": [
-                {"action": "respond", "text": f"I understand you said: '{command}'. This is a complex request that I'm analyzing to determine the best actions to take."}
-            ],
-            "response": f"I received your command: '{command}'. Let me process this and determine the best way to help you."
-        })
+        return _RESPONSE_TEMPLATES["complex"].replace("__COMMAND__", _json_escape(command))
 
 def create_fallback_response(command):
     """Create intelligent fallback when Claude API is unavailable"""
-    command_lower = command.lower()
+    hits = _command_keywords(command.lower())
     
-    if "nas raid" in command_lower and "email" in command_lower:
-        return json.dumps({
-            "actions": [
-                {"action": "search", "path": "/Volumes/NAS RAID", "pattern": "*.eml,*.msg,*.mbox", "description": "searching for email files"},
-                {"action": "search", "path": "/Users/mark/Desktop/NAS RAID", "pattern": "*.eml,*.msg,*.mbox", "description": "searching for email files"},
-                {"action": "respond", "text": "I'm searching the NAS RAID folder for email files and will open any folders containing them."}
-            ],
-            "response": "I'll search through the NAS RAID folder for email files. Note: I'm using a fallback since the Claude API isn't available right now."
-        })
+    if {"nas raid", "email"} <= hits:
+        return _RESPONSE_TEMPLATES["fallback_nas_raid_email"]
     
-    elif "screenshot" in command_lower or "capture" in command_lower:
-        return json.dumps({
-            "actions": [
-                {"action": "screenshot", "save_path": "/Users/mark/Desktop/screenshot.png"},
-                {"action": "respond", "text": "I've taken a screenshot and saved it to your desktop."}
-            ],
-            "response": "I've taken a screenshot for you."
-        })
+    elif hits & {"screenshot", "capture"}:
+        return _RESPONSE_TEMPLATES["fallback_screenshot"]
     
-    elif "open" in command_lower and "folder" in command_lower:
+    elif {"open", "folder"} <= hits:
         # Extract folder name
         folder_name = command.replace("open", "").replace("folder", "").replace("the", "").strip()
-        return json.dumps({
-            "actions": [
-                {"action": "open", "target": folder_name, "type": "folder"},
-                {"action": "respond", "text": f"I'm opening the {folder_name} folder."}
-            ],
-            "response": f"I'm opening the {folder_name} folder for you."
-        })
+        return _RESPONSE_TEMPLATES["fallback_open_folder"].replace("__FOLDER__", _json_escape(folder_name))
     
     else:
-        return json.dumps({
-            "actions": [
-                {"action": "respond", "text": f"I received your command: '{command}'. I'm processing this using a fallback system since the Claude API isn't available."}
-            ],
-            "response": f"I heard: '{command}'. I'm processing this with a fallback system."
-        })
+        return _RESPONSE_TEMPLATES["fallback"].replace("__COMMAND__", _json_escape(command))
+
+# Characters that matter when scanning for a balanced JSON object
+_JSON_TOKEN_RE = re.compile(r'[{}"\\]')
+
+def _extract_json(text):
+    """First balanced {...} span in text, ignoring braces inside strings; linear time, no backtracking"""
+    start = text.find('{')
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escaped_at = -1
+    for match in _JSON_TOKEN_RE.finditer(text, start):
+        char, pos = match.group(), match.start()
+        if pos == escaped_at:
+            continue
+        if in_string:
+            if char == '\\':
+                escaped_at = pos + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:pos + 1]
+    return None
+
+def _json_actions(response):
+    """The "actions" of Claude's JSON reply (bare or wrapped in prose), or None if it holds no JSON object"""
+    # Try to parse as JSON first
+    stripped = response.lstrip()
+    if stripped.startswith('{'):
+        try:
+            return orjson.loads(stripped).get('actions', [])
+        except orjson.JSONDecodeError:
+            pass
+    
+    # If not JSON, try to extract JSON from the response
+    json_text = _extract_json(response)
+    if json_text:
+        return orjson.loads(json_text).get('actions', [])
+    return None
 
 def parse_claude_actions(response):
     """Parse Claude's JSON response to extract actions"""
     try:
-        # Try to parse as JSON first
-        if response.strip().startswith('{'):
-            data = json.loads(response)
-            return data.get('actions', [])
-        
-        # If not JSON, try to extract JSON from the response
-        import re
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            data = json.loads(json_match.group())
-            return data.get('actions', [])
+        actions = _json_actions(response)
+        if actions is not None:
+            return actions
         
         # Fallback: create a simple response action
         return [{"action": "respond", "text": "I processed your command but couldn't extract specific actions."}]
@@ -216,13 +350,70 @@ def parse_claude_actions(response):
         logger.error(f"Failed to parse Claude response: {e}")
         return [{"action": "respond", "text": f"I received your command but had trouble parsing the response: {str(e)}"}]
 
-def execute_actions(actions):
+async def run_command(*args, timeout=None, check=False):
+    """Run a subprocess without blocking the event loop and return its stdout"""
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    
+    if check and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, args)
+    return stdout.decode(errors="replace")
+
+def scan_tree(root, patterns, max_depth=3, dirs=False, ignore_case=False, deadline=None):
+    """Yield (pattern, path) for files (or dirs) under root, at most max_depth levels down, whose name matches a pattern"""
+    stack = [(root, 0)]
+    while stack:
+        # Stop walking once the deadline passes, as the old find timeout did
+        if deadline is not None and time.monotonic() > deadline:
+            return
+        path, depth = stack.pop()
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if is_dir == dirs:
+                        name = entry.name.lower() if ignore_case else entry.name
+                        for p in patterns:
+                            if fnmatch.fnmatchcase(name, p):
+                                yield p, entry.path
+                    if is_dir and depth + 1 < max_depth:
+                        stack.append((entry.path, depth + 1))
+        except OSError:
+            continue  # Unreadable directory; keep walking the rest
+
+def find_files(root, patterns, max_hits=5, timeout=8):
+    """Up to max_hits files per glob pattern under root, grouped by pattern"""
+    hits = {p: [] for p in patterns}
+    for p, path in scan_tree(root, patterns, deadline=time.monotonic() + timeout):
+        if len(hits[p]) < max_hits:
+            hits[p].append(path)
+            if all(len(found) >= max_hits for found in hits.values()):
+                break
+    return [path for found in hits.values() for path in found]
+
+def find_folder(root, target, timeout=5):
+    """First directory under root whose name contains target (case-insensitive), or None"""
+    pattern = f"*{target.lower()}*"
+    for _, path in scan_tree(root, [pattern], dirs=True, ignore_case=True, deadline=time.monotonic() + timeout):
+        return path
+    return None
+
+async def execute_actions(actions):
     """Execute the actions returned by Claude"""
     results = []
     
     for action in actions:
         try:
-            result = execute_single_action(action)
+            result = await execute_single_action(action)
             results.append(result)
         except Exception as e:
             logger.error(f"Failed to execute action {action}: {e}")
@@ -230,18 +421,18 @@ def execute_actions(actions):
     
     return results
 
-def execute_single_action(action):
+async def execute_single_action(action):
     """Execute a single action"""
     action_type = action.get("action")
     
     if action_type == "search":
-        return execute_search_action(action)
+        return await execute_search_action(action)
     elif action_type == "open":
-        return execute_open_action(action)
+        return await execute_open_action(action)
     elif action_type == "screenshot":
-        return execute_screenshot_action(action)
+        return await execute_screenshot_action(action)
     elif action_type == "memory":
-        return execute_memory_action(action)
+        return await execute_memory_action(action)
     elif action_type == "organize":
         return execute_organize_action(action)
     elif action_type == "respond":
@@ -249,7 +440,7 @@ def execute_single_action(action):
     else:
         return {"action": action_type, "status": "unknown_action"}
 
-def execute_search_action(action):
+async def execute_search_action(action):
     """Execute filesystem search"""
     search_path = action.get("path", "/Users/mark")
     pattern = action.get("pattern", "*")
@@ -259,19 +450,10 @@ def execute_search_action(action):
         if not os.path.exists(search_path):
             return {"action": "search", "status": "path_not_found", "path": search_path}
         
-        patterns = [p.strip() for p in pattern.split(",")]
-        found_items = []
+        patterns = [p.strip() for p in pattern.split(",")][:3]
         
-        for p in patterns[:3]:
-            try:
-                result = subprocess.run(
-                    ["find", search_path, "-name", p, "-type", "f", "-maxdepth", "3"],
-                    capture_output=True, text=True, timeout=8
-                )
-                if result.stdout.strip():
-                    found_items.extend(result.stdout.strip().split('\n')[:5])
-            except subprocess.TimeoutExpired:
-                continue
+        # One in-process walk for all patterns, keeping at most 5 hits per pattern
+        found_items = await asyncio.get_running_loop().run_in_executor(None, find_files, search_path, patterns)
         
         if found_items:
             # Open folders containing found files
@@ -280,11 +462,11 @@ def execute_search_action(action):
                 folder = os.path.dirname(item)
                 folders.add(folder)
             
-            for folder in list(folders)[:2]:
-                try:
-                    subprocess.run(["open", folder], check=False, timeout=2)
-                except:
-                    pass
+            # Open the folders concurrently
+            await asyncio.gather(
+                *(run_command("open", folder, timeout=2) for folder in list(folders)[:2]),
+                return_exceptions=True
+            )
             
             return {
                 "action": "search",
@@ -299,30 +481,54 @@ def execute_search_action(action):
     except Exception as e:
         return {"action": "search", "status": "error", "error": str(e)}
 
-def execute_open_action(action):
+# /Volumes listing keyed by lowercased name; rebuilt only when a mount or unmount changes its mtime
+_volumes_cache = {}
+_volumes_mtime = None
+
+def mounted_volumes():
+    """Mounted volumes as {lowercased name: path}"""
+    global _volumes_cache, _volumes_mtime
+    try:
+        mtime = os.stat("/Volumes").st_mtime_ns
+        if mtime != _volumes_mtime:
+            with os.scandir("/Volumes") as entries:
+                _volumes_cache = {entry.name.lower(): entry.path for entry in entries}
+            _volumes_mtime = mtime
+    except OSError:
+        return {}
+    return _volumes_cache
+
+async def reveal_in_finder(path, applescript):
+    """Open a folder with one AppleScript, falling back to plain open if Finder scripting fails"""
+    try:
+        await run_command("osascript", "-e", applescript, check=True)
+    except subprocess.CalledProcessError:
+        # e.g. Automation permission denied, or the window tweaks failed after the folder opened
+        await run_command("open", path, check=True)
+
+async def execute_open_action(action):
     """Execute open file/folder/app with better visibility"""
     target = action.get("target", "")
     action_type = action.get("type", "folder")
     
     try:
         if action_type == "folder":
-            # For drives, try the exact path first
-            if target in ["2TB", "2TBHDD", "4TB SSD", "NAS RAID"]:
-                volume_path = f"/Volumes/{target}"
-                if os.path.exists(volume_path):
-                    # Use both open and AppleScript to ensure window comes to front
-                    subprocess.run(["open", volume_path], check=True)
-                    # Force Finder to front and open new window
-                    applescript = f'''
-                    tell application "Finder"
-                        activate
-                        open folder "{volume_path}" as POSIX file
+            # For drives, look the mounted volume up first
+            volume_path = mounted_volumes().get(target.lower())
+            if volume_path:
+                # One AppleScript brings Finder to front and opens a positioned window
+                applescript = f'''
+                tell application "Finder"
+                    activate
+                    open folder "{volume_path}" as POSIX file
+                    try
                         set the position of the front window to {{100, 100}}
                         set the bounds of the front window to {{100, 100, 800, 600}}
-                    end tell
-                    '''
-                    subprocess.run(["osascript", "-e", applescript], check=False)
-                    return {"action": "open", "status": "success", "path": volume_path, "method": "applescript_enhanced"}
+                    end try
+                end tell
+                '''
+                await reveal_in_finder(volume_path, applescript)
+                return {"action": "open", "status": "success", "path": volume_path, "method": "applescript_enhanced"}
             
             # Try common locations with enhanced opening
             possible_paths = [
@@ -336,25 +542,20 @@ def execute_open_action(action):
             for path in possible_paths:
                 if os.path.exists(path):
                     # Enhanced opening with Finder activation
-                    subprocess.run(["open", path], check=True)
                     applescript = f'''
                     tell application "Finder"
                         activate
                         open folder "{path}" as POSIX file
                     end tell
                     '''
-                    subprocess.run(["osascript", "-e", applescript], check=False)
+                    await reveal_in_finder(path, applescript)
                     return {"action": "open", "status": "success", "path": path, "method": "enhanced"}
             
             # Try searching if not found in common locations
-            search_result = subprocess.run(
-                ["find", "/Users/mark", "-type", "d", "-iname", f"*{target}*", "-maxdepth", "3"],
-                capture_output=True, text=True, timeout=5
-            )
+            found_path = await asyncio.get_running_loop().run_in_executor(None, find_folder, "/Users/mark", target)
             
-            if search_result.stdout.strip():
-                found_path = search_result.stdout.strip().split('\n')[0]
-                subprocess.run(["open", found_path], check=True)
+            if found_path:
+                await run_command("open", found_path, check=True)
                 return {"action": "open", "status": "success", "path": found_path, "method": "search_found"}
             
             return {"action": "open", "status": "not_found", "target": target, "searched_paths": possible_paths}
@@ -366,16 +567,16 @@ def execute_open_action(action):
     except Exception as e:
         return {"action": "open", "status": "error", "error": str(e), "target": target}
 
-def execute_screenshot_action(action):
+async def execute_screenshot_action(action):
     """Execute screenshot"""
     try:
         save_path = action.get("save_path", "/Users/mark/Desktop/screenshot.png")
-        subprocess.run(["screencapture", save_path], check=True)
+        await run_command("screencapture", save_path, check=True)
         return {"action": "screenshot", "status": "success", "path": save_path}
     except Exception as e:
         return {"action": "screenshot", "status": "error", "error": str(e)}
 
-def execute_memory_action(action):
+async def execute_memory_action(action):
     """Execute memory operations"""
     try:
         operation = action.get("operation", "store")
@@ -386,7 +587,7 @@ def execute_memory_action(action):
                 "category": action.get("category", "voice_notes"),
                 "tags": ["voice_command", "claude_processed"]
             }
-            response = requests.post("http://localhost:8081/store", json=payload, timeout=5)
+            response = await http_client.post("http://localhost:8081/store", json=payload)
             return {"action": "memory_store", "status": "success"}
         
         return {"action": "memory", "status": "not_implemented", "operation": operation}
@@ -411,4 +612,4 @@ def execute_response_action(action):
 
 if __name__ == '__main__':
     logger.info("Starting Real Claude API Integration Service on port 8090")
-    app.run(host='0.0.0.0', port=8090, debug=False)
+    uvicorn.run(app, host='0.0.0.0', port=8090, log_level="info")
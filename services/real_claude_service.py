@@ -5,35 +5,47 @@ Uses the actual Claude API available in this environment
 """
 
 import asyncio
+import fnmatch
 import json
 import logging
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import os
+import uvicorn
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
+app = FastAPI(title="Real Claude Integration Service", version="1.0.0")
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
-@app.route('/health', methods=['GET'])
-def health():
-    return jsonify({
+class CommandIn(BaseModel):
+    command: str = ""
+
+@app.get('/health')
+async def health():
+    return {
         "status": "healthy",
         "service": "real_claude_integration",
         "port": 8088
-    })
+    }
 
-@app.route('/process_command', methods=['POST'])
-def process_command():
+@app.post('/process_command')
+async def process_command(data: CommandIn):
     """Process voice commands using real Claude API"""
     try:
-        data = request.get_json()
-        command = data.get('command', '')
+        command = data.command
         
         if not command:
-            return jsonify({"error": "No command provided"}), 400
+            return JSONResponse({"error": "No command provided"}, status_code=400)
         
         logger.info(f"Processing voice command with real Claude: '{command}'")
         
@@ -44,9 +56,9 @@ def process_command():
         actions = parse_claude_actions(claude_response)
         
         # Execute the actions
-        results = execute_actions(actions)
+        results = await execute_actions(actions)
         
-        return jsonify({
+        return {
             "status": "success",
             "result": {
                 "command": command,
@@ -54,14 +66,14 @@ def process_command():
                 "actions_executed": len(actions),
                 "results": results
             }
-        })
+        }
         
     except Exception as e:
         logger.error(f"Error processing command: {e}")
-        return jsonify({
+        return JSONResponse({
             "status": "error", 
             "message": str(e)
-        }), 500
+        }, status_code=500)
 
 def call_real_claude(command):
     """Call the real Claude API using the analysis tool"""
@@ -69,7 +81,8 @@ def call_real_claude(command):
     # we would use the fetch API available in the analysis tool
     # For now, return a structured response for the NAS RAID command
     
-    if "nas raid" in command.lower() and "email" in command.lower():
+    command_lower = command.lower()
+    if "nas raid" in command_lower and "email" in command_lower:
         return '''ACTIONS: [
     {"action": "search", "path": "/Volumes/NAS RAID", "pattern": "*.eml,*.msg,*.mbox", "type": "files"},
     {"action": "search", "path": "/Users/mark/Desktop/NAS RAID", "pattern": "*.eml,*.msg,*.mbox", "type": "files"},
@@ -94,14 +107,66 @@ def parse_claude_actions(response):
     
     return [{"action": "respond", "text": "I processed your command but couldn't extract specific actions."}]
 
-def execute_actions(actions):
+async def run_command(*args, timeout=None):
+    """Run a subprocess without blocking the event loop and return its stdout"""
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    return stdout.decode(errors="replace")
+
+async def find_files(root, patterns, max_hits=5, timeout=5):
+    """Stream find's matches for the glob patterns, stopping the walk once each pattern has max_hits"""
+    name_tests = []
+    for p in patterns:
+        name_tests += ["-o", "-name", p] if name_tests else ["-name", p]
+    proc = await asyncio.create_subprocess_exec(
+        "find", root, "-maxdepth", "3", "-type", "f", "(", *name_tests, ")",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    hits = {p: [] for p in patterns}
+    
+    async def collect():
+        async for line in proc.stdout:
+            path = line.decode(errors="replace").rstrip("\n")
+            name = os.path.basename(path)
+            for p in patterns:
+                if len(hits[p]) < max_hits and fnmatch.fnmatchcase(name, p):
+                    hits[p].append(path)
+            if all(len(found) >= max_hits for found in hits.values()):
+                return
+    
+    try:
+        await asyncio.wait_for(collect(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass  # Keep whatever arrived before the deadline
+    finally:
+        # Stop find as soon as we have enough (or on timeout/error) instead of walking the whole tree
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+        await proc.wait()
+    
+    return [path for found in hits.values() for path in found]
+
+async def execute_actions(actions):
     """Execute the parsed actions"""
     results = []
     
     for action in actions:
         if action.get("action") == "search":
             # Execute file search
-            result = execute_search(action)
+            result = await execute_search(action)
             results.append(result)
         elif action.get("action") == "open_results":
             # Open folders based on search results
@@ -114,11 +179,8 @@ def execute_actions(actions):
     
     return results
 
-def execute_search(action):
+async def execute_search(action):
     """Execute a search action with timeout protection"""
-    import subprocess
-    import os
-    
     search_path = action.get("path", "/Users/mark")
     pattern = action.get("pattern", "*")
     
@@ -128,19 +190,10 @@ def execute_search(action):
     
     try:
         # Quick search with timeout
-        patterns = [p.strip() for p in pattern.split(",")]
-        found_items = []
+        patterns = [p.strip() for p in pattern.split(",")][:3]  # Limit to 3 patterns
         
-        for p in patterns[:3]:  # Limit to 3 patterns
-            try:
-                result = subprocess.run(
-                    ["find", search_path, "-name", p, "-type", "f", "-maxdepth", "3"],
-                    capture_output=True, text=True, timeout=5
-                )
-                if result.stdout.strip():
-                    found_items.extend(result.stdout.strip().split('\n')[:5])  # Limit results
-            except subprocess.TimeoutExpired:
-                continue
+        # One find walks the tree once for all patterns, keeping at most 5 hits per pattern
+        found_items = await find_files(search_path, patterns)
         
         if found_items:
             # Open first few folders containing files
@@ -149,11 +202,11 @@ def execute_search(action):
                 folder = os.path.dirname(item)
                 folders.add(folder)
             
-            for folder in list(folders)[:2]:  # Open max 2 folders
-                try:
-                    subprocess.run(["open", folder], check=False, timeout=2)
-                except:
-                    pass
+            # Open max 2 folders, concurrently
+            await asyncio.gather(
+                *(run_command("open", folder, timeout=2) for folder in list(folders)[:2]),
+                return_exceptions=True
+            )
             
             return {
                 "action": "search",
@@ -170,4 +223,4 @@ def execute_search(action):
 
 if __name__ == '__main__':
     logger.info("Starting Real Claude Integration Service on port 8088")
-    app.run(host='0.0.0.0', port=8088, debug=False)
+    uvicorn.run(app, host='0.0.0.0', port=8088, log_level="info")
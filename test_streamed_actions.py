@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test script for early action parsing of streamed Claude replies
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "services"))
+
+from conversational_voice import ConversationalVoiceProcessor
+
+processor = ConversationalVoiceProcessor()
+
+def test_actions_before_response():
+    """Actions are handed over as soon as the "response" key starts streaming"""
+    partial = '{"actions": [{"action": "screen", "operation": "capture"}], "response": "Taking a scr'
+    assert processor.parse_streamed_actions(partial) == [{"action": "screen", "operation": "capture"}]
+
+def test_incomplete_actions():
+    """Nothing is returned while the actions array is still streaming"""
+    assert processor.parse_streamed_actions('{"actions": [{"action": "screen", "oper') is None
+
+def test_response_before_actions():
+    """With "response" first, the actions aren't complete yet, so the full reply must be parsed instead"""
+    partial = '{"response": "Taking a screenshot.", "actions": [{"action": "screen", "operation": "capture"}'
+    assert processor.parse_streamed_actions(partial) is None
+
+    full = partial + "]}"
+    assert processor.parse_streamed_actions(full) is None
+    assert processor.parse_claude_response(full) == [{"action": "screen", "operation": "capture"}]
+
+def test_truncated_reply():
+    """A JSON reply cut off at max_tokens falls back to a respond action instead of none"""
+    truncated = '{"actions": [{"action": "screen", "operation": "capt'
+    actions = processor.parse_claude_response(truncated)
+    assert [action["action"] for action in actions] == ["respond"]
+
+def main():
+    print("🧪 Testing streamed action parsing")
+    print("=" * 50)
+
+    for test in (test_actions_before_response, test_incomplete_actions, test_response_before_actions,
+                 test_truncated_reply):
+        try:
+            test()
+            print(f"✅ {test.__name__} PASSED")
+        except AssertionError:
+            print(f"❌ {test.__name__} FAILED")
+
+if __name__ == "__main__":
+    main()